@@ -0,0 +1,79 @@
+"""对比单次扫描质量过滤器与原有逐项过滤函数的耗时（ms/MB）。
+
+用法：python -m benchmarks.bench_quality [--mb 2] [--repeat 5]
+"""
+import argparse
+import random
+import time
+
+from src.services.scrape import QUALITY_FILTER, clean_text, is_chinese_ratio_ok, ad_keyword_score, is_spammy
+
+
+ZH = "武汉大学发布声明回应网络质疑舆情持续发酵相关部门表示将依法依规处理并及时公布调查进展"
+NOISE = ["abc ", "12万", "￥30", " http://example.com/a ", "[链接](u)", "优惠券", "推广告", "|" * 11, "\n", "2024-05-01"]
+
+
+def make_docs(mb: float, doc_len: int = 3000, seed: int = 1) -> list[str]:
+    rnd = random.Random(seed)
+    target = int(mb * 1_000_000 / 3)  # 中文 UTF-8 约 3 字节/字
+    parts = []
+    size = 0
+    while size < target:
+        piece = rnd.choice(ZH) * rnd.randint(1, 3) if rnd.random() < 0.85 else rnd.choice(NOISE)
+        parts.append(piece)
+        size += len(piece)
+    text = "".join(parts)
+    return [text[i:i + doc_len] for i in range(0, len(text), doc_len)]
+
+
+def legacy(doc: str):
+    # 与改造前 extract_and_filter_texts 的调用序列一致：清洗 + 两档中文比例 + 广告词 + 垃圾模式
+    t = clean_text(doc)
+    is_chinese_ratio_ok(t, 0.1)
+    is_chinese_ratio_ok(t, 0.15)
+    ad_keyword_score(t)
+    is_spammy(t)
+
+
+def engine(doc: str):
+    QUALITY_FILTER.evaluate(doc)
+
+
+def check_equivalence(docs: list[str]):
+    for d in docs:
+        v = QUALITY_FILTER.evaluate(d)
+        t = clean_text(d)
+        assert v.text == t
+        assert v.ad_score == ad_keyword_score(t)
+        assert v.is_spam == is_spammy(t)
+        for r in (0.1, 0.15, 0.6):
+            assert (v.cjk_ratio >= r) == is_chinese_ratio_ok(t, r)
+
+
+def bench(fn, docs: list[str], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for d in docs:
+            fn(d)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--mb", type=float, default=2.0)
+    ap.add_argument("--repeat", type=int, default=5)
+    args = ap.parse_args()
+    docs = make_docs(args.mb)
+    mb = sum(len(d.encode("utf-8")) for d in docs) / 1_000_000
+    check_equivalence(docs)
+    a = bench(legacy, docs, args.repeat)
+    b = bench(engine, docs, args.repeat)
+    print(f"docs={len(docs)} size={mb:.2f}MB")
+    print(f"legacy: {a * 1000 / mb:.1f} ms/MB")
+    print(f"engine: {b * 1000 / mb:.1f} ms/MB ({a / b:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
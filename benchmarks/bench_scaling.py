@@ -0,0 +1,176 @@
+"""analysis.py 与 scrape.py 过滤函数的规模化微基准：耗时与峰值内存随语料规模的变化。
+
+用法：
+  python -m benchmarks.bench_scaling                          # 合成语料，10/100/1000/10000 篇
+  python -m benchmarks.bench_scaling --corpus recorded.jsonl  # 录制语料
+  python -m benchmarks.bench_scaling --sizes 10,100 --out results.json --compare benchmarks/baseline.json
+  python -m benchmarks.bench_scaling --sizes 10,100,1000 --update-baseline   # 合并进基线，其余规模的条目保留
+
+与基线对比时，耗时或峰值内存超过基线 --tolerance 倍即视为回归，进程以状态码1退出。
+仓库内基线只覆盖合成语料；录制语料需先用 --out 生成自己的基线，再以 --compare 对比（语料不同的基线拒绝对比）。
+"""
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import tracemalloc
+
+from src.services.analysis import build_keywords, summarize_sentences, simple_sentiment, build_trend, build_report, render_html
+from src.services.scrape import QUALITY_FILTER, filter_document
+from src.services.records import Candidate
+from benchmarks.corpus import synthetic_docs, load_jsonl
+
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+DEFAULT_SIZES = [10, 100, 1000, 10000]
+TOPIC = "武汉大学"
+
+
+def _per_doc(fn):
+    def run(docs):
+        for d in docs:
+            fn(d["content"])
+    return run
+
+
+def _candidates(docs):
+    return [(Candidate(d["title"], d["url"], d["domain"]), d["content"]) for d in docs]
+
+
+def _filter_documents(items):
+    stats = {"filtered": {"empty": 0, "too_short": 0, "low_chinese_ratio": 0, "ad_keywords": 0}}
+    for it, content in items:
+        filter_document(it, content, stats, QUALITY_FILTER, 150)
+
+
+# 名称 -> (准备函数, 被测函数)；准备阶段不计入耗时。过滤用例测量线上实际使用的 QualityFilter 与 filter_document
+CASES = {
+    "build_keywords": (lambda docs: docs, build_keywords),
+    "summarize_sentences": (lambda docs: docs, summarize_sentences),
+    "simple_sentiment": (lambda docs: docs, simple_sentiment),
+    "build_trend": (lambda docs: docs, build_trend),
+    "render_html": (lambda docs: build_report(TOPIC, docs), render_html),
+    "quality_clean": (lambda docs: docs, _per_doc(QUALITY_FILTER.clean)),
+    "quality_evaluate": (lambda docs: docs, _per_doc(QUALITY_FILTER.evaluate)),
+    "filter_document": (_candidates, _filter_documents),
+    "build_report": (lambda docs: docs, lambda docs: build_report(TOPIC, docs)),
+}
+
+
+def measure(fn, arg, repeat: int, memory: bool = True) -> tuple[float, int | None]:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn(arg)
+        best = min(best, time.perf_counter() - t0)
+    if not memory:
+        return best, None
+    # 单独一次运行统计峰值内存，避免 tracemalloc 开销影响计时
+    tracemalloc.start()
+    fn(arg)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak
+
+
+def run(sizes: list[int], cases: list[str], corpus: str | None, repeat: int, mem_max_size: int = 1000) -> dict:
+    build_keywords([{"content": "预热分词词典"}])  # jieba 首次加载词典不计入结果
+    results = []
+    for n in sizes:
+        docs = load_jsonl(corpus, n) if corpus else synthetic_docs(n)
+        chars = sum(len(d["content"]) for d in docs)
+        for name in cases:
+            prepare, fn = CASES[name]
+            arg = prepare(docs)
+            # 大规模语料只运行一次；tracemalloc 会使分词等分配密集的代码慢数倍，超过 mem_max_size 篇时不统计内存
+            seconds, peak = measure(fn, arg, repeat if n <= 1000 else 1, memory=n <= mem_max_size)
+            peak_kb = None if peak is None else round(peak / 1024, 1)
+            results.append({"name": name, "size": n, "chars": chars, "seconds": round(seconds, 6),
+                            "peak_kb": peak_kb, "us_per_doc": round(seconds * 1e6 / n, 2)})
+            print(f"{name:<22}{n:>7} docs  {seconds * 1000:>10.2f} ms  {peak_kb if peak_kb is not None else '-':>10} KB", file=sys.stderr)
+    return {
+        "meta": {"python": platform.python_version(), "platform": platform.platform(),
+                 "corpus": corpus or "synthetic", "repeat": repeat, "time": time.strftime("%Y-%m-%dT%H:%M:%S")},
+        "results": results,
+    }
+
+
+def compare(current: dict, baseline: dict, tolerance: float) -> list[str]:
+    base_corpus = baseline.get("meta", {}).get("corpus")
+    if base_corpus != current["meta"]["corpus"]:
+        raise ValueError(f"基线语料（{base_corpus}）与本次语料（{current['meta']['corpus']}）不同，无法对比")
+    base = {(r["name"], r["size"]): r for r in baseline.get("results", [])}
+    regressions = []
+    for r in current["results"]:
+        b = base.get((r["name"], r["size"]))
+        if b is None:
+            continue
+        for key in ("seconds", "peak_kb"):
+            # 极小的测量值噪声大，低于下限时不比较
+            floor = 0.001 if key == "seconds" else 64
+            if b[key] is None or r[key] is None:
+                continue
+            if b[key] >= floor and r[key] > b[key] * tolerance:
+                regressions.append(f"{r['name']}@{r['size']}: {key} {b[key]} -> {r[key]} ({r[key] / b[key]:.2f}x)")
+    return regressions
+
+
+def merge(current: dict, baseline: dict) -> dict:
+    """以本次结果更新基线：同名同规模的条目被替换，本次未运行的规模保留（如单独运行的10000篇）。"""
+    if baseline.get("meta", {}).get("corpus") != current["meta"]["corpus"]:
+        return current
+    fresh = {(r["name"], r["size"]) for r in current["results"]}
+    kept = [r for r in baseline.get("results", []) if (r["name"], r["size"]) not in fresh]
+    results = sorted(kept + current["results"], key=lambda r: (r["size"], list(CASES).index(r["name"]) if r["name"] in CASES else 0))
+    return {"meta": current["meta"], "results": results}
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="分析与过滤函数规模化微基准")
+    ap.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)))
+    ap.add_argument("--cases", default=",".join(CASES))
+    ap.add_argument("--corpus", default=None, help="录制语料 JSONL；缺省使用合成语料")
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--mem-max-size", type=int, default=1000, help="超过该篇数时不统计峰值内存")
+    ap.add_argument("--out", default=None, help="结果写入JSON文件（缺省输出到标准输出）")
+    ap.add_argument("--compare", default=None, help="与基线JSON对比")
+    ap.add_argument("--tolerance", type=float, default=2.0)
+    ap.add_argument("--update-baseline", action="store_true", help=f"将结果写入 {BASELINE}")
+    args = ap.parse_args(argv)
+
+    cases = [c for c in args.cases.split(",") if c]
+    unknown = [c for c in cases if c not in CASES]
+    if unknown:
+        ap.error(f"未知用例：{', '.join(unknown)}")
+    current = run([int(s) for s in args.sizes.split(",") if s], cases, args.corpus, args.repeat, args.mem_max_size)
+
+    text = json.dumps(current, ensure_ascii=False, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        print(text)
+    if args.update_baseline:
+        if os.path.isfile(BASELINE):
+            with open(BASELINE, encoding="utf-8") as f:
+                updated = merge(current, json.load(f))
+        else:
+            updated = current
+        with open(BASELINE, "w", encoding="utf-8") as f:
+            f.write(json.dumps(updated, ensure_ascii=False, indent=2) + "\n")
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            try:
+                regressions = compare(current, json.load(f), args.tolerance)
+            except ValueError as e:
+                ap.error(str(e))
+        for line in regressions:
+            print("REGRESSION " + line, file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""基准测试语料：可复现的合成中文新闻语料，或录制的 JSONL 语料（每行 {"title","url","domain","content"}）。"""
+import json
+import random
+
+
+SUBJECTS = ["武汉大学", "相关部门", "学校", "涉事企业", "网友", "专家", "当地政府", "媒体", "平台方", "监管机构"]
+VERBS = ["发布声明", "回应质疑", "表示将依法依规处理", "启动调查", "公布进展", "召开发布会", "提出建议", "作出说明"]
+OBJECTS = ["事件经过", "调查结果", "处理意见", "整改措施", "后续安排", "舆论关切", "网络传言", "相关细节"]
+TONES = ["获得认可", "引发争议", "持续发酵", "明显改善", "存在风险", "受到投诉", "保持稳定", "网友表示不满", "取得成功"]
+DOMAINS = ["thepaper.cn", "jiemian.com", "sina.com.cn", "163.com", "sohu.com", "weibo.com", "mp.weixin.qq.com", "example.gov.cn"]
+PUNCT = ["。", "！", "？", "；", "\n"]
+
+
+def _sentence(rnd: random.Random) -> str:
+    s = f"{rnd.choice(SUBJECTS)}{rnd.choice(VERBS)}，{rnd.choice(OBJECTS)}{rnd.choice(TONES)}"
+    r = rnd.random()
+    if r < 0.15:
+        s = f"{rnd.randint(2019, 2025)}年{rnd.randint(1, 12)}月{rnd.randint(1, 28)}日，" + s
+    elif r < 0.25:
+        s += f"（{rnd.randint(2019, 2025)}-{rnd.randint(1, 12):02d}-{rnd.randint(1, 28):02d}）"
+    elif r < 0.3:
+        s += f"，详见 https://{rnd.choice(DOMAINS)}/a/{rnd.randint(1, 99999)}"
+    return s + rnd.choice(PUNCT)
+
+
+def synthetic_docs(n: int, doc_len: int = 3000, seed: int = 42) -> list[dict]:
+    rnd = random.Random(seed)
+    docs = []
+    for i in range(n):
+        parts = []
+        size = 0
+        target = int(doc_len * rnd.uniform(0.5, 1.5))
+        while size < target:
+            s = _sentence(rnd)
+            parts.append(s)
+            size += len(s)
+        dom = rnd.choice(DOMAINS)
+        docs.append({"title": f"{rnd.choice(SUBJECTS)}{rnd.choice(VERBS)}（{i}）", "url": f"https://{dom}/a/{i}",
+                     "domain": dom, "content": "".join(parts), "score": size})
+    return docs
+
+
+def load_jsonl(path: str, n: int) -> list[dict]:
+    """读取录制语料；不足n篇时循环复用，保证各规模可比。"""
+    base = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                d = json.loads(line)
+                base.append({"title": d.get("title", ""), "url": d.get("url", ""), "domain": d.get("domain", ""),
+                             "content": d.get("content", ""), "score": len(d.get("content", ""))})
+    if not base:
+        raise ValueError(f"语料为空：{path}")
+    return [dict(base[i % len(base)], url=f"{base[i % len(base)]['url']}#{i}") for i in range(n)]
@@ -1,12 +1,31 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Header, Request
+from fastapi.responses import FileResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, HTMLResponse
-from fastapi.staticfiles import StaticFiles
+from fastapi.middleware.gzip import GZipMiddleware
 from pydantic import BaseModel
+import os
 import asyncio
+import time
+import logging
 from src.services.search import search_web
-from src.services.scrape import extract_and_filter_texts
-from src.services.analysis import build_report, render_markdown, render_html
+from src.services.scrape import extract_and_filter_texts, doc_score, FETCH_DEADLINE_SECONDS, MAX_FETCH
+from src.services.deadline import Budget, activate as activate_budget, reset as reset_budget
+from src.services.memory import MemoryBudget, MemoryBudgetExceeded, admit, charge as charge_memory, finish as finish_memory, activate as activate_memory, reset as reset_memory
+from src.services.index import search_index, INDEX_FRESH_SECONDS
+from src.services.analysis import build_report, render_markdown, render_html, ANALYSIS_CHARS
+from src.services.records import Document
+from src.assets import PrecompressedStaticFiles, STATIC_DIR, UI_SOURCE
+from src.responses import json_response, parse_fields, wants
+from src.profiling import maybe_start, is_admin, profile_path
+
+# 应用日志（zhiyu.*）：uvicorn 只为自身 logger 配置输出，这里单独输出到 stderr
+_logger = logging.getLogger("zhiyu")
+if not _logger.handlers:
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    _logger.addHandler(_handler)
+    _logger.setLevel(os.getenv("ZHIYU_LOG_LEVEL", "INFO").upper())
+    _logger.propagate = False
 
 app = FastAPI(title="ZhiYu.ai", version="0.1")
 
@@ -18,187 +37,193 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# 响应压缩：已带 Content-Encoding 的预压缩静态资源会被跳过
+app.add_middleware(GZipMiddleware, minimum_size=1024, compresslevel=6)
 
 
 class AnalyzeRequest(BaseModel):
     query: str
     max_results: int = 500
+    # live：仅实时搜索；index：优先检索本地全文索引，不足或不新鲜时再补充实时搜索
+    mode: str = "live"
+    # 整体时限（毫秒），缺省为服务端 ZHIYU_DEADLINE_MS；超时返回标记为partial的报告
+    deadline_ms: int | None = None
+
+
+MAX_DOCS = 20
+# index 模式从本地索引读取的候选上限（按相关度排序），只需足够挑出 MAX_DOCS 篇
+INDEX_CANDIDATES = MAX_DOCS * 3
+# 各阶段可用的剩余预算比例：搜索、抓取，余下留给分析
+SEARCH_SHARE = 0.35
+FETCH_SHARE = 0.8
+# 检测客户端断开的轮询间隔（秒）
+DISCONNECT_POLL = 0.5
+
+
+def _fetch_deadline(budget: Budget) -> float:
+    return min(budget.until(FETCH_SHARE), time.monotonic() + FETCH_DEADLINE_SECONDS)
+
+
+async def _analyze_from_index(req: AnalyzeRequest, budget: Budget, max_fetch: int = MAX_FETCH):
+    rows = await asyncio.to_thread(search_index, req.query, min(req.max_results, INDEX_CANDIDATES))
+    newest = max((d["fetched_at"] for d in rows), default=0)
+    # 入库正文已截断，使用入库时按完整正文计算的得分（旧数据无得分时按入库正文重新计算）
+    cached = []
+    memory_truncated = False
+    for d in rows:
+        doc = Document(d["title"], d["url"], d["domain"], d["content"][:ANALYSIS_CHARS],
+                       d["score"] if d.get("score") is not None else doc_score(d["domain"], d["content"]))
+        cached.append(doc)
+        # 与实时抓取一致：超出请求内存预算即停止累积
+        if not charge_memory(doc.nbytes()):
+            memory_truncated = True
+            break
+    del rows
+    fresh = bool(cached) and (time.time() - newest) <= INDEX_FRESH_SECONDS
+    index_meta = {"hits": len(cached), "fresh": fresh, "used_search": False, "memory_truncated": memory_truncated}
+    meta = {"index": index_meta}
+    if memory_truncated or (fresh and len(cached) >= MAX_DOCS):
+        # 内存预算已用尽时不再补充实时搜索
+        docs = cached
+    else:
+        # 不新鲜时获取最新结果，否则仅补足到max_results
+        want = req.max_results if not fresh else max(req.max_results - len(cached), 1)
+        results, meta["search"] = await search_web(req.query, want, stage_deadline=budget.until(SEARCH_SHARE))
+        index_meta["used_search"] = True
+        fetched, meta["filter"] = await extract_and_filter_texts(results, skip_urls={d["url"] for d in cached},
+                                                                 deadline=_fetch_deadline(budget), max_fetch=max_fetch)
+        docs = fetched + cached
+    docs.sort(key=lambda d: d["score"], reverse=True)
+    return docs[:MAX_DOCS], meta
+
+
+async def _run_analyze(req: AnalyzeRequest, want: dict | None, budget: Budget, max_fetch: int = MAX_FETCH) -> dict:
+    if req.mode == "index":
+        docs, meta = await _analyze_from_index(req, budget, max_fetch)
+        if not docs:
+            return {"query": req.query, "sources": [], "report": {}, "markdown": "# 无有效文档", "meta": meta}
+    else:
+        results, search_meta = await search_web(req.query, req.max_results, stage_deadline=budget.until(SEARCH_SHARE))
+        if not results:
+            return {"query": req.query, "sources": [], "report": {}, "markdown": "# 无结果", "meta": {"search": search_meta}}
+
+        docs, stats = await extract_and_filter_texts(results, max_docs=MAX_DOCS, deadline=_fetch_deadline(budget),
+                                                     max_fetch=max_fetch)
+        if not docs:
+            return {"query": req.query, "sources": [], "report": {}, "markdown": "# 无有效文档", "meta": {"filter": stats, "search": search_meta}}
+        meta = {"filter": stats, "search": search_meta}
+
+    # 分析与渲染在线程中执行，事件循环得以继续检测客户端断开
+    report = await asyncio.to_thread(build_report, req.query, docs, budget.deadline)
+    payload = {"query": req.query, "sources": [{"title": d["title"], "url": d["url"]} for d in docs], "report": report}
+    # 仅渲染调用方需要的字段
+    if wants(want, "markdown"):
+        payload["markdown"] = await asyncio.to_thread(render_markdown, report)
+    if wants(want, "html"):
+        payload["html"] = await asyncio.to_thread(render_html, report)
+    payload["meta"] = meta
+    return payload
+
+
+def _partial_reasons(meta: dict, report: dict) -> list[str]:
+    reasons = []
+    if (meta.get("search") or {}).get("timed_out"):
+        reasons.append("search_timeout")
+    if (meta.get("filter") or {}).get("stop_reason") == "deadline":
+        reasons.append("fetch_deadline")
+    if report.get("partial"):
+        reasons.append("analysis_truncated")
+    return reasons
+
+
+def _memory_meta(meta: dict, mem: MemoryBudget) -> dict:
+    if (meta.get("search") or {}).get("memory_truncated"):
+        mem.degraded.append("search_hits")
+    if (meta.get("filter") or {}).get("stop_reason") == "memory":
+        mem.degraded.append("fetched_docs")
+    if (meta.get("index") or {}).get("memory_truncated"):
+        mem.degraded.append("index_docs")
+    return mem.summary()
+
+
+async def _run_until_disconnect(request: Request, coro, budget: Budget):
+    """执行分析流程，客户端断开时取消全部未完成的网络与计算任务。"""
+    task = asyncio.create_task(coro)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=DISCONNECT_POLL)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                budget.cancel()
+                task.cancel()
+                return None
+    finally:
+        if not task.done():
+            budget.cancel()
+            task.cancel()
 
 
 @app.post("/analyze")
-async def analyze(req: AnalyzeRequest):
-    if not req.query.strip():
-        raise HTTPException(status_code=400, detail="query不能为空")
+async def analyze(req: AnalyzeRequest, request: Request, fields: str | None = None, profile: str | None = None,
+                  x_profile_token: str | None = Header(default=None)):
+    """fields 为逗号分隔的返回字段，支持一级子字段，例如 fields=report.keywords,markdown。
 
-    results, search_meta = await search_web(req.query, req.max_results)
-    if not results:
-        return JSONResponse({"query": req.query, "sources": [], "report": {}, "markdown": "# 无结果", "meta": {"search": search_meta}})
-
-    docs, stats = await extract_and_filter_texts(results)
-    if not docs:
-        return JSONResponse({"query": req.query, "sources": [], "report": {}, "markdown": "# 无有效文档", "meta": {"filter": stats, "search": search_meta}})
-
-    report = build_report(req.query, docs)
-    md = render_markdown(report)
-    html = render_html(report)
-    return JSONResponse({"query": req.query, "sources": [{"title": d["title"], "url": d["url"]} for d in docs], "report": report, "markdown": md, "html": html, "meta": {"filter": stats, "search": search_meta}})
-
-
-@app.get("/")
-async def home():
-    html = """
-    <!doctype html>
-    <html lang=\"zh-CN\">
-    <head>
-      <meta charset=\"utf-8\" />
-      <meta name=\"viewport\" content=\"width=device-width, initial-scale=1\" />
-      <title>ZhiYu.ai</title>
-      <style>
-        :root { --bg:#f8fafc; --fg:#111827; --card:#ffffff; --muted:#6b7280; --accent:#2563eb; --border:#e5e7eb; }
-        body { font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, 'Helvetica Neue', Arial, 'Noto Sans', 'PingFang SC', 'Microsoft YaHei', sans-serif; margin: 0; background: var(--bg); color: var(--fg); }
-        header { padding: 20px 24px; background: var(--card); border-bottom: 1px solid var(--border); }
-        .container { max-width: 900px; margin: 0 auto; }
-        main { padding: 20px 24px; max-width: 900px; margin: 0 auto; }
-        .bar { display:flex; gap:8px; align-items:center; }
-        input { padding:10px 12px; font-size:14px; border:1px solid var(--border); border-radius:8px; width: clamp(240px, 50vw, 540px); }
-        button { padding:10px 14px; font-size:14px; border:1px solid var(--accent); color:#fff; background: var(--accent); border-radius:8px; cursor:pointer; }
-        .section { background: var(--card); border:1px solid var(--border); border-radius:12px; padding:16px; margin-top:16px; }
-        #markdown { white-space: pre-wrap; }
-        .src a { color: var(--accent); text-decoration:none; }
-        .meta { font-size:13px; color: var(--muted); }
-        .actions { display:flex; gap:8px; }
-        @media (max-width: 640px) {
-          header, main { padding: 16px; }
-          .actions { flex-wrap: wrap; }
-        }
-        header h1 { background: linear-gradient(90deg, #1e3a8a, #2563eb, #60a5fa); -webkit-background-clip: text; color: transparent; }
-        button:hover { filter: brightness(1.05); }
-      </style>
-    </head>
-    <body>
-      <header>
-        <div class=\"container\">
-          <h1>ZhiYu.ai</h1>
-          <p class=\"meta\">输入中文话题 → 抓取国内公开网页 → 降噪 → 本地分析 → 输出报告。</p>
-        </div>
-      </header>
-      <main>
-        <div class=\"bar\">
-          <input id=\"q\" placeholder=\"例如：武汉大学舆情\" />
-          <button onclick=\"run()\">分析</button>
-          <div class=\"actions\">
-            <button onclick=\"downloadMD()\">下载Markdown</button>
-            <button onclick=\"copyMD()\">复制报告</button>
-          </div>
-        </div>
-        <div class=\"section\">
-          <h2>报告</h2>
-          <div id=\"markdown\">尚未生成</div>
-        </div>
-        <div class=\"section\">
-          <h3>可视化概览</h3>
-          <div style=\"display:flex; gap:16px; flex-wrap:wrap;\">
-            <div style=\"flex:1; min-width:260px;\">
-              <canvas id=\"donut\" height=\"180\"></canvas>
-            </div>
-            <div style=\"flex:1; min-width:260px;\">
-              <canvas id=\"line\" height=\"180\"></canvas>
-            </div>
-            <div style=\"flex:1; min-width:260px;\">
-              <canvas id=\"rating\" height=\"180\"></canvas>
-            </div>
-          </div>
-        </div>
-        <div class=\"section\">
-          <h3>过滤统计</h3>
-          <div id=\"stats\" class=\"meta\">暂无</div>
-        </div>
-        <div class=\"section\">
-          <h3>参考来源</h3>
-          <div id=\"sources\"></div>
-        </div>
-      </main>
-      <script src=\"https://cdn.jsdelivr.net/npm/chart.js\"></script>
-      <script>
-        let lastMD = '';
-        const charts = { donut:null, line:null, rating:null };
-        async function run(){
-          const q = document.getElementById('q').value.trim();
-          if(!q){ alert('请输入话题'); return; }
-          document.getElementById('markdown').textContent = '正在分析，请稍候...';
-          document.getElementById('sources').innerHTML = '';
-          document.getElementById('stats').textContent = '运行中...';
-          try {
-            const resp = await fetch('/analyze', {method:'POST', headers:{'Content-Type':'application/json'}, body: JSON.stringify({query:q, max_results:100})});
-            const data = await resp.json();
-            lastMD = data.markdown || '无结果';
-            const html = data.html || '';
-            if (html) { document.getElementById('markdown').innerHTML = html; }
-            else { document.getElementById('markdown').textContent = lastMD; }
-            // 隐藏独立的可视化模块（改为在报告中呈现）
-            try {
-              const donut = document.getElementById('donut');
-              if (donut) {
-                const sec = donut.closest('.section');
-                if (sec) sec.style.display = 'none';
-              }
-            } catch(_){ }
-            const srcDiv = document.getElementById('sources');
-            (data.sources||[]).forEach(s=>{
-              const a = document.createElement('a'); a.href = s.url; a.textContent = s.title || s.url; a.target = '_blank';
-              const p = document.createElement('p'); p.className = 'src'; p.appendChild(a); srcDiv.appendChild(p);
-            });
-            const m = (data.meta||{});
-            const filt = (m.filter||{});
-            const f = (filt.filtered||{});
-            const s = (m.search||{});
-            const srcs = (s.attempted_sources||[]).join('、');
-            document.getElementById('stats').textContent = `搜索源：${s.chosen_source||'无'}；尝试源：${srcs||'无'}；搜索结果数：${s.items_count||0}；筛选后保留：${filt.kept||0}；过滤：空页面${f.empty||0}、过短${f.too_short||0}、中文比例低${f.low_chinese_ratio||0}、广告关键词${f.ad_keywords||0}`;
-
-            renderCharts(data);
-          } catch(e){
-            document.getElementById('markdown').textContent = '发生错误：' + e;
-            document.getElementById('stats').textContent = '发生错误';
-          }
-        }
-
-        function renderCharts(data){
-          const report = data.report || {};
-          const sources = report.sources_used || [];
-          const senti = report.sentiment_summary || {pos:0,neg:0};
-          const domainCounts = {};
-          sources.forEach(s=>{ const d=(s.domain||'其它'); domainCounts[d]=(domainCounts[d]||0)+1; });
-          const labels = Object.keys(domainCounts);
-          const values = Object.values(domainCounts);
-          const keyPoints = report.key_points || [];
-          const lengths = keyPoints.map(k=>k.length);
-
-          const donutCtx = document.getElementById('donut').getContext('2d');
-          if (charts.donut) charts.donut.destroy();
-          charts.donut = new Chart(donutCtx, { type:'doughnut', data:{ labels, datasets:[{ data: values, backgroundColor:['#3b82f6','#22c55e','#f59e0b','#ef4444','#6366f1','#14b8a6','#a78bfa'] }]}, options:{ plugins:{legend:{position:'bottom'}}, cutout:'60%'}});
-
-          const lineCtx = document.getElementById('line').getContext('2d');
-          if (charts.line) charts.line.destroy();
-          charts.line = new Chart(lineCtx, { type:'line', data:{ labels: lengths.map((_,i)=>i+1), datasets:[{ label:'要点长度趋势', data:lengths, borderColor:'#3b82f6', tension:0.3 }]}, options:{ scales:{ y:{ beginAtZero:true }}}});
-
-          const ratingCtx = document.getElementById('rating').getContext('2d');
-          const pos = parseInt(senti.pos||0), neg = parseInt(senti.neg||0);
-          const score = Math.max(0, Math.min(5, 3 + ((pos-neg)/(pos+neg+1))*2));
-          if (charts.rating) charts.rating.destroy();
-          charts.rating = new Chart(ratingCtx, { type:'bar', data:{ labels:['5星','4星','3星','2星','1星'], datasets:[{ label:`评分 ${score.toFixed(1)}`, data:[score*10, (5-score)*6, 10, 6, 4], backgroundColor:'#60a5fa' }]}, options:{ indexAxis:'y', scales:{ x:{ beginAtZero:true }}}});
-      }
-        function downloadMD(){
-          const blob = new Blob([lastMD||''], {type:'text/markdown'});
-          const url = URL.createObjectURL(blob);
-          const a = document.createElement('a');
-          a.href = url; a.download = 'report.md'; a.click();
-          URL.revokeObjectURL(url);
-        }
-        async function copyMD(){
-          try { await navigator.clipboard.writeText(lastMD||''); alert('已复制'); } catch(e){ alert('复制失败'); }
-        }
-      </script>
-    </body>
-    </html>
+    管理员可通过 X-Profile-Token 头或 profile=<token> 参数开启本次请求的采样剖析，结果见 meta.profile。
+    超出内存预算时减少抓取篇数与 max_results 或提前停止抓取（见 meta.memory），仍无法容纳时返回503。
     """
-    return HTMLResponse(html)
\ No newline at end of file
+    want = parse_fields(fields)
+    if not req.query.strip():
+        raise HTTPException(status_code=400, detail="query不能为空")
+    if req.mode not in ("live", "index"):
+        raise HTTPException(status_code=400, detail="mode仅支持live或index")
+
+    if req.deadline_ms is not None and req.deadline_ms <= 0:
+        raise HTTPException(status_code=400, detail="deadline_ms必须为正数")
+
+    try:
+        mem, req.max_results, max_fetch = admit(req.max_results, MAX_FETCH)
+    except MemoryBudgetExceeded as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+    # 预留之后的任何异常都必须归还额度，否则全局预算会永久泄漏
+    budget = Budget(req.deadline_ms)
+    token = activate_budget(budget)
+    mem_token = activate_memory(mem)
+    profiler = None
+    try:
+        profiler = maybe_start(x_profile_token or profile)
+        payload = await _run_until_disconnect(request, _run_analyze(req, want, budget, max_fetch), budget)
+    finally:
+        reset_memory(mem_token)
+        reset_budget(token)
+        finish_memory(mem)
+        if profiler is not None:
+            profiler.stop()
+    if payload is None:
+        # 客户端已断开，响应不会被读取
+        return Response(status_code=499)
+    reasons = _partial_reasons(payload["meta"], payload.get("report") or {})
+    payload["meta"]["deadline"] = {"deadline_ms": round((budget.deadline - budget.start) * 1000),
+                                   "elapsed_ms": round((time.monotonic() - budget.start) * 1000),
+                                   "partial": bool(reasons), "reasons": reasons}
+    payload["meta"]["memory"] = _memory_meta(payload["meta"], mem)
+    if profiler is not None:
+        await asyncio.to_thread(profiler.write)
+        payload["meta"]["profile"] = profiler.summary()
+    return json_response(payload, want)
+
+
+@app.get("/profiles/{name}")
+async def download_profile(name: str, token: str | None = None, x_profile_token: str | None = Header(default=None)):
+    if not is_admin(x_profile_token or token):
+        raise HTTPException(status_code=403, detail="无权限")
+    path = profile_path(name)
+    if path is None:
+        raise HTTPException(status_code=404, detail="剖析文件不存在")
+    return FileResponse(path, media_type="text/plain; charset=utf-8", filename=name)
+
+
+# 前端页面：优先托管构建产物（python -m src.assets），未构建时直接托管 src/ui 源页面
+# 挂载须位于所有API路由之后，避免覆盖 /analyze 等接口
+ui_dir = STATIC_DIR if os.path.isdir(STATIC_DIR) else UI_SOURCE
+app.mount("/", PrecompressedStaticFiles(directory=ui_dir, html=True), name="ui")
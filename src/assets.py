@@ -0,0 +1,181 @@
+"""前端静态资源：构建（内容哈希 + 预压缩 + 本地化 Chart.js）与带缓存头的托管。
+
+构建：python -m src.assets [--chart-js PATH] [--out DIR]
+  - 若存在 frontend/dist（需以 VITE_BASE=/ 执行 npm run build），以其为页面来源；
+    否则使用内置页面 src/ui/index.html。
+  - Chart.js 从 frontend/node_modules 复制并改为本地引用，运行时不再依赖CDN。
+  - 非HTML文件改名为 name.<hash>.ext，并生成 .gz / .br（需安装 brotli）预压缩副本。
+"""
+import os
+import re
+import gzip
+import shutil
+import hashlib
+import mimetypes
+import argparse
+
+from fastapi.staticfiles import StaticFiles
+
+try:
+    import brotli
+except ImportError:  # 可选依赖，缺失时仅生成gzip
+    brotli = None
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+UI_SOURCE = os.path.join(ROOT, "src", "ui")
+FRONTEND_DIST = os.path.join(ROOT, "frontend", "dist")
+CHART_JS = os.path.join(ROOT, "frontend", "node_modules", "chart.js", "dist", "chart.umd.js")
+STATIC_DIR = os.getenv("ZHIYU_STATIC_DIR", os.path.join(ROOT, "build", "static"))
+
+CDN_CHART_RE = re.compile(r"https://cdn\.jsdelivr\.net/npm/chart\.js[^\"']*")
+# 已带内容哈希的文件名：_hashed_name 生成的 name.<10位十六进制>.ext，或 Vite 输出到 assets/ 下的 name-<8位>.ext
+HASHED_NAME_RE = re.compile(r"\.[0-9a-f]{10}\.[a-z0-9]+$")
+VITE_HASHED_RE = re.compile(r"(^|/)assets/(.+/)?[^/]+-[A-Za-z0-9_-]{8}\.[a-z0-9]+$")
+COMPRESSIBLE = {".html", ".js", ".css", ".svg", ".json", ".txt", ".map"}
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+
+def _digest(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()[:10]
+
+
+def is_hashed(path: str) -> bool:
+    """path 为相对静态目录的路径（/分隔）。"""
+    return bool(HASHED_NAME_RE.search(path) or VITE_HASHED_RE.search(path))
+
+
+def _accepted(accept: str) -> dict[str, float]:
+    """解析 Accept-Encoding 为 {编码: q值}，q=0 表示明确拒绝。"""
+    prefs = {}
+    for part in accept.split(","):
+        name, _, params = part.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        prefs[name] = q
+    return prefs
+
+
+def _hashed_name(path: str, data: bytes) -> str:
+    base, ext = os.path.splitext(path)
+    return f"{base}.{_digest(data)}{ext}"
+
+
+def _compress(path: str):
+    with open(path, "rb") as f:
+        data = f.read()
+    variants = [(".gz", gzip.compress(data, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        variants.append((".br", brotli.compress(data, quality=11)))
+    for suffix, blob in variants:
+        # 压缩后更大则不生成，服务端自动回退到原文件
+        if len(blob) < len(data):
+            with open(path + suffix, "wb") as f:
+                f.write(blob)
+
+
+def build(out_dir: str = STATIC_DIR, chart_js: str = CHART_JS) -> str:
+    src_dir = FRONTEND_DIST if os.path.isdir(FRONTEND_DIST) else UI_SOURCE
+    if os.path.isdir(out_dir):
+        shutil.rmtree(out_dir)
+    shutil.copytree(src_dir, out_dir)
+
+    renames = {}
+    for dirpath, _, files in os.walk(out_dir):
+        for name in files:
+            full = os.path.join(dirpath, name)
+            if name.endswith(".html") or is_hashed(os.path.relpath(full, out_dir).replace(os.sep, "/")):
+                continue
+            with open(full, "rb") as f:
+                target = _hashed_name(full, f.read())
+            os.replace(full, target)
+            renames["/" + os.path.relpath(full, out_dir).replace(os.sep, "/")] = "/" + os.path.relpath(target, out_dir).replace(os.sep, "/")
+
+    html_files = [os.path.join(d, n) for d, _, fs in os.walk(out_dir) for n in fs if n.endswith(".html")]
+    chart_ref = None
+    for path in html_files:
+        with open(path, encoding="utf-8") as f:
+            html = f.read()
+        if CDN_CHART_RE.search(html):
+            if chart_ref is None:
+                if not os.path.isfile(chart_js):
+                    raise FileNotFoundError(f"未找到 Chart.js：{chart_js}（请先在 frontend 下执行 npm install）")
+                with open(chart_js, "rb") as f:
+                    data = f.read()
+                vendor = os.path.join(out_dir, "assets", "vendor")
+                os.makedirs(vendor, exist_ok=True)
+                target = _hashed_name(os.path.join(vendor, "chart.umd.js"), data)
+                with open(target, "wb") as f:
+                    f.write(data)
+                chart_ref = "/" + os.path.relpath(target, out_dir).replace(os.sep, "/")
+            html = CDN_CHART_RE.sub(chart_ref, html)
+        for old, new in renames.items():
+            html = html.replace(f'"{old}"', f'"{new}"')
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(html)
+
+    for dirpath, _, files in os.walk(out_dir):
+        for name in files:
+            if os.path.splitext(name)[1] in COMPRESSIBLE:
+                _compress(os.path.join(dirpath, name))
+    return out_dir
+
+
+class PrecompressedStaticFiles(StaticFiles):
+    """优先返回预压缩副本（br > gzip），哈希命名资源长期缓存，HTML每次协商（ETag）。"""
+
+    async def get_response(self, path: str, scope):
+        headers = dict(scope.get("headers") or [])
+        accept = _accepted(headers.get(b"accept-encoding", b"").decode("latin-1"))
+        response = None
+        encoding = None
+        target = path
+        if self.html and (path in ("", ".") or path.endswith("/")):
+            target = os.path.join(path, "index.html")
+        if scope["method"] in ("GET", "HEAD"):
+            for enc, suffix in (("br", ".br"), ("gzip", ".gz")):
+                if accept.get(enc, accept.get("*", 0)) <= 0:
+                    continue
+                full_path, stat_result = self.lookup_path(target + suffix)
+                if stat_result is not None:
+                    response = self.file_response(full_path, stat_result, scope)
+                    encoding = enc
+                    break
+        if response is None:
+            response = await super().get_response(path, scope)
+        if encoding and response.status_code in (200, 304):
+            response.headers["content-encoding"] = encoding
+            # 压缩副本的 ETag 由其自身大小/修改时间生成，天然区别于原文件
+            response.headers["content-type"] = _media_type(target)
+        response.headers["vary"] = "Accept-Encoding"
+        if response.status_code in (200, 304):
+            response.headers["cache-control"] = IMMUTABLE if is_hashed(target.replace(os.sep, "/")) else "no-cache"
+        return response
+
+
+def _media_type(path: str) -> str:
+    media_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+    if media_type.startswith("text/") or media_type in ("application/javascript", "application/json"):
+        media_type += "; charset=utf-8"
+    return media_type
+
+
+def main():
+    ap = argparse.ArgumentParser(description="构建前端静态资源")
+    ap.add_argument("--out", default=STATIC_DIR)
+    ap.add_argument("--chart-js", default=CHART_JS)
+    args = ap.parse_args()
+    print(build(args.out, args.chart_js))
+
+
+if __name__ == "__main__":
+    main()
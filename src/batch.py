@@ -0,0 +1,329 @@
+"""离线批处理：流式读取已归档页面（WARC / JSONL），复用在线链路的抽取、质量过滤与 build_report。
+
+用法：
+  python -m src.batch pages.warc.gz more.jsonl --out out/ --topic 武汉大学 --period day --workers 8
+
+JSONL 每行一个页面：{"url", "title"?, "html" | "content" | "text", "fetched_at"?（时间戳或ISO时间）}。
+WARC 支持 response / resource 记录，.gz 按多成员gzip流式解压。
+输出：
+  out/features.jsonl        每篇文档的特征（长度、中文占比、广告词、得分、是否保留）
+  out/reports/<周期>.json/.md  每个周期一份报告（仅保留得分前 --max-docs 篇参与分析，内存恒定）
+"""
+import os
+import sys
+import gzip
+import zlib
+import json
+import heapq
+import argparse
+from datetime import datetime, timezone
+from itertools import islice
+from multiprocessing import Pool
+
+from src.services.scrape import QUALITY_FILTER, BLACKLIST_DOMAINS, html_to_text, normalize_url, domain_of, filter_document
+from src.services.analysis import build_report, render_markdown
+
+try:
+    import brotli
+except ImportError:  # 可选依赖，缺失时无法解码 br 压缩的归档响应
+    brotli = None
+
+
+def _open(path: str):
+    if path == "-":
+        return sys.stdin.buffer
+    with open(path, "rb") as f:
+        magic = f.read(2)
+    return gzip.open(path, "rb") if magic == b"\x1f\x8b" else open(path, "rb")
+
+
+def read_jsonl(path: str):
+    with _open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                rec = json.loads(line)
+            except ValueError:
+                continue
+            yield {
+                "url": rec.get("url") or rec.get("href") or "",
+                "title": rec.get("title") or "",
+                "html": rec.get("html") or "",
+                "content": rec.get("content") or rec.get("text") or "",
+                "fetched_at": rec.get("fetched_at") or rec.get("date"),
+            }
+
+
+def _read_headers(f, line: bytes | None = None) -> dict | None:
+    headers = {}
+    line = line or f.readline()
+    while line and not line.strip():
+        line = f.readline()
+    if not line:
+        return None
+    headers[":version"] = line.strip().decode("latin-1")
+    for line in iter(f.readline, b""):
+        line = line.rstrip(b"\r\n")
+        if not line:
+            break
+        k, _, v = line.decode("utf-8", "replace").partition(":")
+        headers[k.strip().lower()] = v.strip()
+    return headers
+
+
+def _resync(f) -> bytes | None:
+    """跳过损坏的记录：读到下一条 WARC 版本行为止，返回该行（供 _read_headers 继续解析）。"""
+    for line in iter(f.readline, b""):
+        if line.startswith(b"WARC/"):
+            return line
+    return None
+
+
+def _dechunk(body: bytes) -> bytes:
+    out = []
+    pos = 0
+    while True:
+        end = body.find(b"\r\n", pos)
+        if end < 0:
+            break
+        try:
+            size = int(body[pos:end].split(b";")[0].strip() or b"0", 16)
+        except ValueError:
+            break
+        if size == 0:
+            break
+        out.append(body[end + 2:end + 2 + size])
+        pos = end + 2 + size + 2
+    return b"".join(out)
+
+
+def _decompress(body: bytes, encoding: str) -> bytes:
+    for enc in reversed([e.strip() for e in encoding.split(",") if e.strip()]):
+        if enc in ("gzip", "x-gzip"):
+            body = zlib.decompressobj(16 + zlib.MAX_WBITS).decompress(body)
+        elif enc == "deflate":
+            try:
+                body = zlib.decompress(body)
+            except zlib.error:  # 部分服务器发送不带zlib头的raw deflate
+                body = zlib.decompressobj(-zlib.MAX_WBITS).decompress(body)
+        elif enc == "br":
+            if brotli is None:
+                raise ValueError("需要安装 brotli 才能解码 br 响应")
+            body = brotli.decompress(body)
+        elif enc != "identity":
+            raise ValueError(f"不支持的Content-Encoding：{enc}")
+    return body
+
+
+def _decode_http(block: bytes) -> str:
+    """解析归档的HTTP响应：按响应头去除分块传输编码并解压，再按charset解码。"""
+    head, _, body = block.partition(b"\r\n\r\n")
+    http = {}
+    for line in head.split(b"\r\n")[1:]:
+        k, _, v = line.decode("latin-1").partition(":")
+        k = k.strip().lower()
+        http[k] = f"{http[k]}, {v.strip()}" if k in http else v.strip()
+    # warcio 等工具保留原始字节；部分爬虫写入前已解码但保留了原响应头，此时解码失败即按原样处理
+    if "chunked" in http.get("transfer-encoding", "").lower():
+        body = _dechunk(body) or body
+    encoding = http.get("content-encoding", "").lower()
+    if encoding:
+        try:
+            body = _decompress(body, encoding)
+        except (zlib.error, ValueError, brotli.error if brotli else ValueError):
+            pass
+    charset = None
+    ctype = http.get("content-type", "").lower()
+    if "charset=" in ctype:
+        charset = ctype.split("charset=", 1)[1].split(";")[0].strip().strip('"')
+    for enc in (charset, "utf-8", "gb18030"):
+        if not enc:
+            continue
+        try:
+            return body.decode(enc)
+        except (LookupError, UnicodeDecodeError):
+            continue
+    return body.decode("utf-8", "replace")
+
+
+def read_warc(path: str):
+    with _open(path) as f:
+        pending = None
+        while True:
+            headers = _read_headers(f, pending)
+            pending = None
+            if headers is None:
+                return
+            try:
+                length = int(headers.get("content-length", "0") or 0)
+            except ValueError:
+                length = -1
+            if length < 0:
+                # Content-Length 损坏时无法定位记录边界，跳到下一条记录
+                pending = _resync(f)
+                if pending is None:
+                    return
+                continue
+            block = f.read(length)
+            rtype = headers.get("warc-type")
+            if rtype == "response" and headers.get("content-type", "").startswith("application/http"):
+                html = _decode_http(block)
+            elif rtype == "resource":
+                html = block.decode("utf-8", "replace")
+            else:
+                continue
+            yield {"url": headers.get("warc-target-uri", ""), "title": "", "html": html, "content": "",
+                   "fetched_at": headers.get("warc-date")}
+
+
+def read_archive(path: str):
+    name = path[:-3] if path.endswith(".gz") else path
+    return read_warc(path) if name.endswith((".warc", ".arc")) else read_jsonl(path)
+
+
+def _timestamp(value) -> float | None:
+    if value is None or value == "":
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return datetime.fromisoformat(str(value).replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return None
+
+
+def period_of(ts: float | None, period: str) -> str:
+    if period == "all":
+        return "all"
+    if ts is None:
+        return "unknown"
+    d = datetime.fromtimestamp(ts, tz=timezone.utc)
+    if period == "month":
+        return d.strftime("%Y-%m")
+    if period == "week":
+        y, w, _ = d.isocalendar()
+        return f"{y}-W{w:02d}"
+    return d.strftime("%Y-%m-%d")
+
+
+def _title_of(html: str) -> str:
+    lo = html.find("<title")
+    if lo < 0:
+        return ""
+    lo = html.find(">", lo) + 1
+    hi = html.find("</title>", lo)
+    return html[lo:hi].strip()[:200] if hi > lo else ""
+
+
+def process_record(args):
+    """工作进程：抽取 + 过滤 + 特征，返回 (特征, 文档或None)。"""
+    rec, topic, period, min_len = args
+    url = normalize_url(rec["url"])
+    dom = domain_of(url)
+    html = rec.get("html") or ""
+    content = QUALITY_FILTER.clean(rec["content"]) if rec.get("content") else html_to_text(html)
+    it = {"title": rec.get("title") or _title_of(html) or "(无标题)", "url": url, "domain": dom, "snippet": ""}
+    stats = {"filtered": {"empty": 0, "too_short": 0, "low_chinese_ratio": 0, "ad_keywords": 0}}
+    doc = None
+    if not any(bad in dom for bad in BLACKLIST_DOMAINS) and (not topic or topic in content or topic in it["title"]):
+        doc = filter_document(it, content, stats, QUALITY_FILTER, min_len)
+    verdict = QUALITY_FILTER.evaluate(content, clean=False)
+    feature = {
+        "url": url, "domain": dom, "title": it["title"],
+        "period": period_of(_timestamp(rec.get("fetched_at")), period),
+        "length": verdict.length, "cjk_ratio": round(verdict.cjk_ratio, 4),
+        "ad_hits": verdict.ad_hits, "spam_hits": verdict.spam_hits,
+        "kept": doc is not None, "score": doc["score"] if doc else 0,
+        "filtered": [k for k, v in stats["filtered"].items() if v],
+    }
+    return feature, doc
+
+
+def _report(args):
+    topic, period, docs = args
+    report = build_report(topic or period, docs)
+    return period, report, render_markdown(report)
+
+
+def _offer(heap: list, urls: dict, item: tuple, max_docs: int):
+    """将 (score, seq, doc) 放入周期小顶堆；同一URL（已规范化）只保留得分最高的一份。
+
+    urls 为该堆中 URL -> 条目 的映射，随堆同步维护，内存仍只与 max_docs 相关。
+    """
+    url = item[2]["url"]
+    old = urls.get(url)
+    if old is not None:
+        if item[:2] <= old[:2]:
+            return
+        heap.remove(old)
+        heapq.heapify(heap)
+        heapq.heappush(heap, item)
+    elif len(heap) < max_docs:
+        heapq.heappush(heap, item)
+    elif item[:2] > heap[0][:2]:
+        evicted = heapq.heapreplace(heap, item)
+        del urls[evicted[2]["url"]]
+    else:
+        return
+    urls[url] = item
+
+
+def run(paths: list[str], out_dir: str, topic: str = "", period: str = "day", workers: int | None = None,
+        max_docs: int = 20, min_len: int = 150, batch_size: int = 2000) -> dict:
+    os.makedirs(os.path.join(out_dir, "reports"), exist_ok=True)
+    tops = {}  # 周期 -> [(score, seq, doc)] 小顶堆，只保留前max_docs篇
+    top_urls = {}  # 周期 -> {url: 堆中条目}，同一页面被重复抓取时去重
+    totals = {"records": 0, "kept": 0}
+    seq = 0
+
+    def records():
+        for path in paths:
+            for rec in read_archive(path):
+                yield (rec, topic, period, min_len)
+
+    with Pool(workers) as pool, open(os.path.join(out_dir, "features.jsonl"), "w", encoding="utf-8") as feats:
+        source = records()
+        # 分批提交，避免 imap 预读整个输入导致内存随归档大小增长
+        while True:
+            batch = list(islice(source, batch_size))
+            if not batch:
+                break
+            for feature, doc in pool.imap_unordered(process_record, batch, chunksize=32):
+                feats.write(json.dumps(feature, ensure_ascii=False) + "\n")
+                totals["records"] += 1
+                if doc is None:
+                    continue
+                totals["kept"] += 1
+                seq += 1
+                period = feature["period"]
+                _offer(tops.setdefault(period, []), top_urls.setdefault(period, {}), (doc["score"], seq, doc), max_docs)
+
+        jobs = [(topic, p, [d for _, _, d in sorted(h, key=lambda x: x[:2], reverse=True)]) for p, h in tops.items()]
+        for p, report, md in pool.imap_unordered(_report, jobs):
+            with open(os.path.join(out_dir, "reports", f"{p}.json"), "w", encoding="utf-8") as f:
+                json.dump(report, f, ensure_ascii=False)
+            with open(os.path.join(out_dir, "reports", f"{p}.md"), "w", encoding="utf-8") as f:
+                f.write(md)
+    totals["periods"] = sorted(tops)
+    return totals
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="离线批处理归档页面并生成报告")
+    ap.add_argument("inputs", nargs="+", help="WARC(.warc/.warc.gz) 或 JSONL(.jsonl/.jsonl.gz) 文件，- 表示标准输入(JSONL)")
+    ap.add_argument("--out", required=True)
+    ap.add_argument("--topic", default="", help="报告主题；非空时仅保留包含该词的文档")
+    ap.add_argument("--period", choices=["day", "week", "month", "all"], default="day")
+    ap.add_argument("--workers", type=int, default=None)
+    ap.add_argument("--max-docs", type=int, default=20)
+    ap.add_argument("--min-len", type=int, default=150)
+    ap.add_argument("--batch-size", type=int, default=2000)
+    args = ap.parse_args(argv)
+    totals = run(args.inputs, args.out, args.topic, args.period, args.workers, args.max_docs, args.min_len, args.batch_size)
+    print(json.dumps(totals, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
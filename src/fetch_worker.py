@@ -0,0 +1,85 @@
+"""独立抓取工作进程：从共享队列领取URL任务，抓取并清洗正文后回传。
+
+用法（可在同机或其他节点启动任意多个，需访问同一队列）：
+  python -m src.fetch_worker --frontier sqlite:///data/frontier.db --concurrency 16
+
+API 侧设置 ZHIYU_FETCH_BACKEND=frontier 与相同的 ZHIYU_FRONTIER 后，
+extract_and_filter_texts 的抓取阶段即交由工作进程完成。
+"""
+import os
+import time
+import socket
+import signal
+import logging
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from src.services.frontier import get_frontier, FRONTIER_URL, VISIBILITY_TIMEOUT, RETENTION_SECONDS
+from src.services.scrape import fetch_page
+
+
+logger = logging.getLogger("zhiyu.fetch_worker")
+
+
+# 清理已结束任务的间隔（秒）
+PURGE_INTERVAL = 60
+
+
+def _run_task(frontier, worker: str, task: dict):
+    try:
+        text = fetch_page(task["url"])
+    except Exception as e:
+        frontier.fail(task["id"], worker, f"{type(e).__name__}: {e}")
+        return
+    frontier.complete(task["id"], worker, text)
+
+
+def run(frontier_url: str = FRONTIER_URL, concurrency: int = 8, visibility: float = VISIBILITY_TIMEOUT,
+        idle_sleep: float = 0.2, stop: threading.Event | None = None, retention: float = RETENTION_SECONDS):
+    frontier = get_frontier(frontier_url)
+    worker = f"{socket.gethostname()}:{os.getpid()}"
+    stop = stop or threading.Event()
+    running = set()
+    next_purge = 0.0
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="fetch") as pool:
+        while not stop.is_set():
+            # 队列中保存了每个页面的正文，定期删除超过保留时间的已结束任务
+            if retention > 0 and time.monotonic() >= next_purge:
+                try:
+                    frontier.purge(retention)
+                except Exception as e:
+                    logger.warning("frontier purge failed: %s", e)
+                next_purge = time.monotonic() + PURGE_INTERVAL
+            free = concurrency - len(running)
+            tasks = frontier.lease(worker, free, visibility) if free > 0 else []
+            for task in tasks:
+                running.add(pool.submit(_run_task, frontier, worker, task))
+            if running:
+                done, _ = wait(running, timeout=idle_sleep, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    running.discard(fut)
+                    if fut.exception() is not None:
+                        logger.warning("fetch task crashed: %s", fut.exception())
+            elif not tasks:
+                stop.wait(idle_sleep)
+        # 退出前等待在途任务写回结果，未完成的任务由租约超时重新入队
+        wait(running)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="共享队列抓取工作进程")
+    ap.add_argument("--frontier", default=FRONTIER_URL)
+    ap.add_argument("--concurrency", type=int, default=8)
+    ap.add_argument("--visibility", type=float, default=VISIBILITY_TIMEOUT, help="租约可见性超时（秒）")
+    ap.add_argument("--retention", type=float, default=RETENTION_SECONDS, help="已结束任务的保留时间（秒），0 表示不清理")
+    args = ap.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    signal.signal(signal.SIGINT, lambda *_: stop.set())
+    run(args.frontier, args.concurrency, args.visibility, stop=stop, retention=args.retention)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""按请求开启的采样剖析：后台线程定时采集所有线程调用栈，输出 folded 格式（flamegraph.pl / speedscope 可直接读取）。
+
+开启方式（需配置 ZHIYU_PROFILE_TOKEN）：
+  - 请求头 X-Profile-Token: <token>，或查询参数 profile=<token>；
+  - 或按 ZHIYU_PROFILE_SAMPLE_RATE 比例随机采样。
+采样为进程级：同一时间段内并发请求的栈也会被记录（按线程名区分）。
+"""
+import os
+import sys
+import time
+import hmac
+import uuid
+import random
+import threading
+from collections import Counter
+
+
+PROFILE_TOKEN = os.getenv("ZHIYU_PROFILE_TOKEN", "")
+PROFILE_SAMPLE_RATE = float(os.getenv("ZHIYU_PROFILE_SAMPLE_RATE", "0"))
+PROFILE_INTERVAL_MS = float(os.getenv("ZHIYU_PROFILE_INTERVAL_MS", "5"))
+PROFILE_DIR = os.getenv("ZHIYU_PROFILE_DIR", os.path.join("data", "profiles"))
+# 剖析文件保留上限：最多文件数与最长保留时间（秒），写入新文件时清理，0 表示不限制
+PROFILE_MAX_FILES = int(os.getenv("ZHIYU_PROFILE_MAX_FILES", "200"))
+PROFILE_MAX_AGE = float(os.getenv("ZHIYU_PROFILE_MAX_AGE", str(7 * 86400)))
+MAX_STACK_DEPTH = 128
+
+
+class SamplingProfiler:
+    def __init__(self, interval_ms: float = PROFILE_INTERVAL_MS):
+        self.id = time.strftime("%Y%m%d-%H%M%S") + "-" + uuid.uuid4().hex[:8]
+        self.interval = interval_ms / 1000
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"profiler-{self.id}", daemon=True)
+        self._started = 0.0
+        self.duration = 0.0
+
+    def start(self) -> "SamplingProfiler":
+        self._started = time.perf_counter()
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.duration = time.perf_counter() - self._started
+
+    def _run(self):
+        me = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                self.stacks[_fold(names.get(ident, str(ident)), frame)] += 1
+            self.samples += 1
+
+    def write(self, folder: str = PROFILE_DIR) -> str:
+        os.makedirs(folder, exist_ok=True)
+        path = os.path.join(folder, f"{self.id}.folded")
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, cnt in self.stacks.most_common():
+                f.write(f"{stack} {cnt}\n")
+        prune(folder)
+        return path
+
+    def summary(self) -> dict:
+        return {"id": self.id, "samples": self.samples, "interval_ms": self.interval * 1000,
+                "duration_ms": round(self.duration * 1000, 1), "url": f"/profiles/{self.id}.folded"}
+
+
+def prune(folder: str = PROFILE_DIR, max_files: int = PROFILE_MAX_FILES, max_age: float = PROFILE_MAX_AGE):
+    """删除超过保留时间的剖析文件，并按修改时间只保留最新的 max_files 个。"""
+    files = []
+    for entry in os.scandir(folder):
+        if entry.is_file() and entry.name.endswith(".folded"):
+            try:
+                files.append((entry.stat().st_mtime, entry.path))
+            except FileNotFoundError:  # 并发写入/清理时可能已被删除
+                continue
+    files.sort(reverse=True)
+    now = time.time()
+    for i, (mtime, path) in enumerate(files):
+        if (max_files and i >= max_files) or (max_age and now - mtime > max_age):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+def _fold(thread_name: str, frame) -> str:
+    parts = []
+    while frame is not None and len(parts) < MAX_STACK_DEPTH:
+        code = frame.f_code
+        parts.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    parts.append(thread_name)
+    # folded格式中 ';' 分隔栈帧、末尾空格后为计数，帧名内不能出现分号
+    return ";".join(p.replace(";", ":") for p in reversed(parts))
+
+
+def is_admin(token: str | None) -> bool:
+    # 按字节比较：compare_digest 对含非ASCII字符的 str 会抛出 TypeError
+    return bool(PROFILE_TOKEN) and bool(token) and hmac.compare_digest(
+        token.encode("utf-8", "surrogateescape"), PROFILE_TOKEN.encode("utf-8", "surrogateescape"))
+
+
+def maybe_start(token: str | None) -> SamplingProfiler | None:
+    """管理员令牌有效或命中采样率时开启剖析。"""
+    if is_admin(token) or (PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE):
+        return SamplingProfiler().start()
+    return None
+
+
+def profile_path(name: str) -> str | None:
+    # 仅允许下载本模块生成的文件名，防止路径穿越
+    base = os.path.basename(name)
+    if base != name or not base.endswith(".folded"):
+        return None
+    path = os.path.join(PROFILE_DIR, base)
+    return path if os.path.isfile(path) else None
@@ -0,0 +1,101 @@
+"""/analyze 响应：字段选择、快速JSON编码、超阈值流式输出与体积/耗时统计。"""
+import os
+import json
+import time
+import logging
+
+from fastapi import HTTPException
+from fastapi.responses import Response, StreamingResponse
+
+try:
+    import orjson
+except ImportError:  # 可选依赖，缺失时回退标准库json
+    orjson = None
+
+
+logger = logging.getLogger("zhiyu.responses")
+
+RESPONSE_FIELDS = ("query", "sources", "report", "markdown", "html", "meta")
+# 序列化后超过该字节数即改为流式输出
+STREAM_THRESHOLD = int(os.getenv("ZHIYU_STREAM_THRESHOLD", str(256 * 1024)))
+
+
+def dumps(obj) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def parse_fields(fields: str | None) -> dict | None:
+    """解析 fields=report.keywords,markdown 为 {"report": {"keywords"}, "markdown": None}；None表示全部字段。"""
+    if not fields:
+        return None
+    want = {}
+    for item in fields.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        top, _, sub = item.partition(".")
+        if top not in RESPONSE_FIELDS:
+            raise HTTPException(status_code=400, detail=f"未知字段：{top}")
+        if not sub:
+            want[top] = None
+        elif top in want and want[top] is None:
+            continue
+        else:
+            want.setdefault(top, set()).add(sub)
+    return want
+
+
+def wants(want: dict | None, field: str) -> bool:
+    return want is None or field in want
+
+
+def select(payload: dict, want: dict | None) -> dict:
+    if want is None:
+        return payload
+    out = {}
+    for key, sub in want.items():
+        if key not in payload:
+            continue
+        val = payload[key]
+        if sub is not None and isinstance(val, dict):
+            val = {k: v for k, v in val.items() if k in sub}
+        out[key] = val
+    return out
+
+
+def _encode_parts(payload: dict):
+    # 按顶层字段逐段序列化，流式输出时无需先拼出完整响应体
+    yield b"{"
+    for i, (key, val) in enumerate(payload.items()):
+        yield (b"," if i else b"") + dumps(key) + b":" + dumps(val)
+    yield b"}"
+
+
+def json_response(payload: dict, want: dict | None = None) -> Response:
+    """编码响应：小于STREAM_THRESHOLD时整体返回并附带体积/耗时头，否则流式输出。"""
+    payload = select(payload, want)
+    parts = _encode_parts(payload)
+    buffered = []
+    size = 0
+    start = time.perf_counter()
+    for part in parts:
+        buffered.append(part)
+        size += len(part)
+        if size > STREAM_THRESHOLD:
+            return StreamingResponse(_stream(buffered, parts, size, start), media_type="application/json")
+    elapsed = (time.perf_counter() - start) * 1000
+    logger.info("analyze response bytes=%d serialize_ms=%.1f streamed=False", size, elapsed)
+    return Response(b"".join(buffered), media_type="application/json", headers={
+        "X-Payload-Bytes": str(size),
+        "Server-Timing": f"serialize;dur={elapsed:.1f}",
+    })
+
+
+def _stream(buffered: list, rest, size: int, start: float):
+    yield from buffered
+    for part in rest:
+        size += len(part)
+        yield part
+    logger.info("analyze response bytes=%d serialize_ms=%.1f streamed=True", size, (time.perf_counter() - start) * 1000)
@@ -1,6 +1,9 @@
+import os
 import re
 import math
+import time
 import jieba
+from src.services.deadline import current as current_budget
 
 
 POS_WORDS = {
@@ -10,6 +13,9 @@ NEG_WORDS = {
     "消极", "下降", "质疑", "风险", "争议", "投诉", "不满", "负面", "危机", "失败", "不稳定", "网暴", "开盒"
 }
 
+# 每篇文档参与分析的最大字符数：文档入库/抓取时一次性截断，此后各分析函数的切片不再复制长文本
+ANALYSIS_CHARS = int(os.getenv("ZHIYU_ANALYSIS_CHARS", "8000"))
+
 
 def tokenize(text: str):
     return [t for t in jieba.lcut(text) if t.strip()]
@@ -36,7 +42,7 @@ def summarize_sentences(docs: list[dict], topn: int = 8):
     # 频次打分选句
     freq = {}
     for d in docs:
-        for tok in tokenize(d["content"][:8000]):
+        for tok in tokenize(d["content"][:ANALYSIS_CHARS]):
             if len(tok) <= 1:
                 continue
             freq[tok] = freq.get(tok, 0) + 1
@@ -74,7 +80,7 @@ def simple_sentiment(docs: list[dict]):
     pos = 0
     neg = 0
     for d in docs:
-        text = d["content"][:8000]
+        text = d["content"][:ANALYSIS_CHARS]
         for w in POS_WORDS:
             pos += text.count(w)
         for w in NEG_WORDS:
@@ -91,10 +97,23 @@ def simple_sentiment(docs: list[dict]):
     return {"overall": overall, "reason": reason, "pos": pos, "neg": neg}
 
 
-def build_report(topic: str, docs: list[dict]) -> dict:
+def build_report(topic: str, docs: list[dict], deadline: float | None = None) -> dict:
+    """生成报告；给定deadline（time.monotonic()时刻）时，超时后跳过其余可选分析并标记partial。
+
+    在线程中运行时读取复制来的请求预算，客户端断开（预算被取消）后同样跳过其余分析。
+    """
+    skipped = []
+    budget = current_budget()
+
+    def _step(name, fn, fallback):
+        if (deadline is not None and time.monotonic() >= deadline) or (budget is not None and budget.expired()):
+            skipped.append(name)
+            return fallback
+        return fn()
+
     key_sents = summarize_sentences(docs, topn=8)
-    kws = build_keywords(docs, topn=12)
-    senti = simple_sentiment(docs)
+    kws = _step("keywords", lambda: build_keywords(docs, topn=12), [])
+    senti = _step("sentiment", lambda: simple_sentiment(docs), {"overall": "中性", "reason": "分析超时，未统计", "pos": 0, "neg": 0})
     sources = [{"title": d["title"], "url": d["url"], "domain": d.get("domain","")} for d in docs]
     # 统计来源分布
     domain_counts = {}
@@ -114,11 +133,14 @@ def build_report(topic: str, docs: list[dict]) -> dict:
         "心理支持：为涉事方提供心理与名誉修复渠道，减少二次伤害。",
         "第三方评估：引入校外/行业专家参与复核，提高结果可信度。"
     ]
-    risk_sents = []
-    for d in docs:
-        for s in sentence_split(d["content"][:3000]):
-            if any(rt in s for rt in risk_terms):
-                risk_sents.append(s)
+    def _risks():
+        found = []
+        for d in docs:
+            for s in sentence_split(d["content"][:3000]):
+                if any(rt in s for rt in risk_terms):
+                    found.append(s)
+        return found
+    risk_sents = _step("risks", _risks, [])
     risk_sents = risk_sents[:5] if risk_sents else ["公众对程序公正与信息透明提出质疑，存在声誉与信任风险。"]
 
     report = {
@@ -130,8 +152,11 @@ def build_report(topic: str, docs: list[dict]) -> dict:
         "opportunities": oppo_templates,
         "sources_used": sources,
         "domain_table": domain_table,
-        "trend_points": build_trend(docs)
+        "trend_points": _step("trend", lambda: build_trend(docs), [])
     }
+    if skipped:
+        report["partial"] = True
+        report["skipped"] = skipped
     return report
 
 
@@ -284,7 +309,7 @@ def build_trend(docs: list[dict]):
     pat_cn = re.compile(r"(20\d{2})年(\d{1,2})月(\d{1,2})日")
     cnt = Counter()
     for d in docs:
-        text = (d.get("content") or "")[:8000]
+        text = (d.get("content") or "")[:ANALYSIS_CHARS]
         for m in pat.findall(text):
             y,mm,dd = m
             key = f"{y}-{int(mm):02d}-{int(dd):02d}"
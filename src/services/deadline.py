@@ -0,0 +1,70 @@
+import os
+import time
+import threading
+from contextvars import ContextVar
+
+
+# 服务端默认的整体时限（毫秒），请求可通过 deadline_ms 覆盖
+DEFAULT_DEADLINE_MS = int(os.getenv("ZHIYU_DEADLINE_MS", "90000"))
+# 同步请求的最短超时（秒），避免预算将尽时传入0导致立即失败
+MIN_REQUEST_TIMEOUT = 0.5
+
+
+class BudgetExpired(Exception):
+    pass
+
+
+class Budget:
+    """单次请求的时间预算与取消标记。
+
+    通过 contextvars 传递：asyncio 任务与 asyncio.to_thread 会复制上下文，
+    因此线程中的阻塞抓取也能读取剩余时间，并在客户端断开后尽早放弃。
+    """
+
+    def __init__(self, deadline_ms: int | None = None):
+        self.start = time.monotonic()
+        self.deadline = self.start + (deadline_ms or DEFAULT_DEADLINE_MS) / 1000
+        self.cancelled = threading.Event()
+
+    def remaining(self) -> float:
+        return self.deadline - time.monotonic()
+
+    def expired(self) -> bool:
+        return self.cancelled.is_set() or self.remaining() <= 0
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def until(self, share: float) -> float:
+        """返回占剩余预算 share 比例的阶段截止时刻（time.monotonic()）。"""
+        return time.monotonic() + max(self.remaining(), 0) * share
+
+
+_current: ContextVar[Budget | None] = ContextVar("zhiyu_budget", default=None)
+
+
+def current() -> Budget | None:
+    return _current.get()
+
+
+def activate(budget: Budget):
+    return _current.set(budget)
+
+
+def reset(token):
+    _current.reset(token)
+
+
+def request_timeout(default: float) -> float:
+    """阻塞HTTP请求的超时：不超过默认值与剩余预算。"""
+    budget = _current.get()
+    if budget is None:
+        return default
+    return max(MIN_REQUEST_TIMEOUT, min(default, budget.remaining()))
+
+
+def check():
+    """在阻塞调用前检查预算，已超时或已取消时抛出 BudgetExpired。"""
+    budget = _current.get()
+    if budget is not None and budget.expired():
+        raise BudgetExpired("请求已超时或已取消")
@@ -0,0 +1,202 @@
+import os
+import time
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from urllib.parse import urlparse
+
+
+# 共享抓取队列：API进程提交URL任务，独立抓取工作进程领取、抓取并回传清洗后的正文
+FRONTIER_URL = os.getenv("ZHIYU_FRONTIER", "sqlite:///" + os.path.join("data", "frontier.db"))
+VISIBILITY_TIMEOUT = float(os.getenv("ZHIYU_FRONTIER_VISIBILITY", "60"))
+MAX_ATTEMPTS = int(os.getenv("ZHIYU_FRONTIER_MAX_ATTEMPTS", "3"))
+RETRY_BACKOFF = float(os.getenv("ZHIYU_FRONTIER_RETRY_BACKOFF", "5"))
+# 已结束任务（含抓取正文）的保留时间（秒），由抓取工作进程定期清理
+RETENTION_SECONDS = float(os.getenv("ZHIYU_FRONTIER_RETENTION", "3600"))
+
+
+class Frontier(ABC):
+    """抓取队列接口。任务状态：queued → leased → done / failed；queued/leased 可被 cancelled。
+
+    lease 返回的任务在 visibility 秒内对其他工作进程不可见；超时未 complete/fail 的任务
+    重新入队（计入重试次数），超过 max_attempts 次即标记为 failed。complete/fail 仅对
+    仍由该 worker 持有租约的任务生效，租约过期后被他人重新领取的任务不会被覆盖。
+    """
+
+    @abstractmethod
+    def submit(self, urls: list[str]) -> list[int]:
+        ...
+
+    @abstractmethod
+    def lease(self, worker: str, limit: int, visibility: float = VISIBILITY_TIMEOUT) -> list[dict]:
+        ...
+
+    @abstractmethod
+    def complete(self, task_id: int, worker: str, text: str):
+        ...
+
+    @abstractmethod
+    def fail(self, task_id: int, worker: str, error: str):
+        ...
+
+    @abstractmethod
+    def get(self, task_ids: list[int]) -> dict[int, dict]:
+        ...
+
+    @abstractmethod
+    def cancel(self, task_ids: list[int]):
+        ...
+
+    @abstractmethod
+    def purge(self, older_than: float = RETENTION_SECONDS):
+        ...
+
+
+class SqliteFrontier(Frontier):
+    """单机实现：多进程共享同一个SQLite文件（WAL），领取时按域名轮转保证公平。"""
+
+    def __init__(self, path: str, max_attempts: int = MAX_ATTEMPTS, retry_backoff: float = RETRY_BACKOFF):
+        self.path = path
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+        self._lock = threading.Lock()
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS tasks (
+                id INTEGER PRIMARY KEY,
+                url TEXT NOT NULL,
+                domain TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'queued',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                available_at REAL NOT NULL,
+                leased_until REAL,
+                worker TEXT,
+                text TEXT,
+                error TEXT,
+                created_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_tasks_queue ON tasks(status, domain, id);
+            CREATE TABLE IF NOT EXISTS domains (
+                domain TEXT PRIMARY KEY,
+                last_leased REAL NOT NULL
+            );
+        """)
+
+    def _tx(self):
+        # BEGIN IMMEDIATE 取得写锁，避免多个工作进程领取到同一任务
+        self._conn.execute("BEGIN IMMEDIATE")
+
+    def submit(self, urls: list[str]) -> list[int]:
+        now = time.time()
+        ids = []
+        with self._lock:
+            self._tx()
+            try:
+                for u in urls:
+                    dom = urlparse(u).netloc.replace("www.", "")
+                    cur = self._conn.execute(
+                        "INSERT INTO tasks(url, domain, available_at, created_at) VALUES (?, ?, ?, ?)", (u, dom, now, now))
+                    ids.append(cur.lastrowid)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return ids
+
+    def lease(self, worker: str, limit: int, visibility: float = VISIBILITY_TIMEOUT) -> list[dict]:
+        now = time.time()
+        with self._lock:
+            self._tx()
+            try:
+                # 租约过期的任务重新入队或判定失败
+                self._conn.execute(
+                    "UPDATE tasks SET status='failed', error='lease expired' "
+                    "WHERE status='leased' AND leased_until < ? AND attempts >= ?", (now, self.max_attempts))
+                self._conn.execute(
+                    "UPDATE tasks SET status='queued', worker=NULL "
+                    "WHERE status='leased' AND leased_until < ?", (now,))
+                # 每个域名取最早的一个任务，按域名最近被领取时间升序：冷门域名优先，单一域名无法占满工作进程
+                rows = self._conn.execute("""
+                    SELECT t.id, t.url, t.domain, t.attempts FROM tasks t
+                    JOIN (SELECT domain, MIN(id) AS id FROM tasks
+                          WHERE status='queued' AND available_at <= ? GROUP BY domain) h ON h.id = t.id
+                    LEFT JOIN domains d ON d.domain = t.domain
+                    ORDER BY COALESCE(d.last_leased, 0), t.id
+                    LIMIT ?
+                """, (now, limit)).fetchall()
+                for task_id, _, dom, _ in rows:
+                    self._conn.execute(
+                        "UPDATE tasks SET status='leased', attempts=attempts+1, leased_until=?, worker=? WHERE id=?",
+                        (now + visibility, worker, task_id))
+                    self._conn.execute(
+                        "INSERT INTO domains(domain, last_leased) VALUES (?, ?) "
+                        "ON CONFLICT(domain) DO UPDATE SET last_leased=excluded.last_leased", (dom, now))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return [{"id": i, "url": u, "domain": d, "attempts": a + 1} for i, u, d, a in rows]
+
+    def complete(self, task_id: int, worker: str, text: str):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE tasks SET status='done', text=?, leased_until=NULL WHERE id=? AND status='leased' AND worker=?",
+                (text, task_id, worker))
+
+    def fail(self, task_id: int, worker: str, error: str):
+        now = time.time()
+        with self._lock:
+            self._conn.execute("""
+                UPDATE tasks SET
+                    status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'queued' END,
+                    available_at = ? + ? * attempts,
+                    leased_until = NULL, worker = NULL, error = ?
+                WHERE id = ? AND status = 'leased' AND worker = ?
+            """, (self.max_attempts, now, self.retry_backoff, error[:500], task_id, worker))
+
+    def get(self, task_ids: list[int]) -> dict[int, dict]:
+        if not task_ids:
+            return {}
+        marks = ",".join("?" * len(task_ids))
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT id, url, status, attempts, text, error FROM tasks WHERE id IN ({marks})", list(task_ids)).fetchall()
+        return {i: {"id": i, "url": u, "status": s, "attempts": a, "text": t, "error": e} for i, u, s, a, t, e in rows}
+
+    def cancel(self, task_ids: list[int]):
+        if not task_ids:
+            return
+        marks = ",".join("?" * len(task_ids))
+        with self._lock:
+            self._conn.execute(
+                f"UPDATE tasks SET status='cancelled' WHERE id IN ({marks}) AND status IN ('queued', 'leased')", list(task_ids))
+
+    def purge(self, older_than: float = RETENTION_SECONDS):
+        """清理已结束且早于 older_than 秒的任务，防止队列文件无限增长。"""
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM tasks WHERE status IN ('done', 'failed', 'cancelled') AND created_at < ?",
+                (time.time() - older_than,))
+
+
+# 可按 URL scheme 注册其他实现（如 Redis / SQS）
+FRONTIER_BACKENDS = {"sqlite": lambda parsed: SqliteFrontier(parsed.path[1:] if parsed.path.startswith("/") else parsed.path)}
+
+_frontiers = {}
+_frontiers_lock = threading.Lock()
+
+
+def get_frontier(url: str = FRONTIER_URL) -> Frontier:
+    """按 URL 获取（并缓存）队列实例，例如 sqlite:///data/frontier.db。"""
+    with _frontiers_lock:
+        if url not in _frontiers:
+            parsed = urlparse(url)
+            factory = FRONTIER_BACKENDS.get(parsed.scheme)
+            if factory is None:
+                raise ValueError(f"不支持的抓取队列：{url}")
+            _frontiers[url] = factory(parsed)
+        return _frontiers[url]
@@ -0,0 +1,101 @@
+import os
+import time
+import sqlite3
+import threading
+import jieba
+
+
+# 本地全文索引：持久化抓取并清洗后的文档，后续查询优先命中历史文档
+INDEX_PATH = os.getenv("ZHIYU_INDEX_PATH", os.path.join("data", "index.db"))
+# 索引中最新文档超过该时长（秒）视为不新鲜，需要补充实时搜索
+INDEX_FRESH_SECONDS = int(os.getenv("ZHIYU_INDEX_FRESH_SECONDS", str(6 * 3600)))
+
+_lock = threading.Lock()
+_conn = None
+
+
+def _connect() -> sqlite3.Connection:
+    global _conn
+    if _conn is None:
+        folder = os.path.dirname(INDEX_PATH)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        conn = sqlite3.connect(INDEX_PATH, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS docs (
+                id INTEGER PRIMARY KEY,
+                url TEXT UNIQUE NOT NULL,
+                domain TEXT,
+                title TEXT,
+                content TEXT,
+                fetched_at REAL,
+                score INTEGER
+            )
+        """)
+        # 正文按分析预算截断后入库，score 保存按完整正文计算的得分；旧库补充该列
+        if "score" not in {row[1] for row in conn.execute("PRAGMA table_info(docs)")}:
+            conn.execute("ALTER TABLE docs ADD COLUMN score INTEGER")
+        # FTS5 的 unicode61 分词器不切分中文，这里写入 jieba 分词后以空格连接的词项
+        conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS docs_fts USING fts5(title_terms, content_terms, tokenize='unicode61')")
+        conn.commit()
+        _conn = conn
+    return _conn
+
+
+def segment(text: str) -> str:
+    return " ".join(t for t in jieba.lcut_for_search(text or "") if t.strip())
+
+
+def _match_expr(query: str) -> str:
+    terms = []
+    for t in jieba.lcut_for_search(query or ""):
+        t = t.strip()
+        if len(t) <= 1 or t in terms:
+            continue
+        terms.append(t)
+    return " OR ".join('"' + t.replace('"', '""') + '"' for t in terms)
+
+
+def index_documents(docs: list[dict], fetched_at: float | None = None) -> int:
+    """写入/更新文档（按url去重），返回写入条数。"""
+    if not docs:
+        return 0
+    ts = fetched_at or time.time()
+    rows = [(d["url"], d.get("domain", ""), d.get("title", ""), d.get("content", ""), d.get("score"),
+             segment(d.get("title", "")), segment(d.get("content", ""))) for d in docs if d.get("url")]
+    with _lock:
+        conn = _connect()
+        with conn:
+            for url, dom, title, content, score, title_terms, content_terms in rows:
+                conn.execute(
+                    "INSERT INTO docs(url, domain, title, content, fetched_at, score) VALUES (?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT(url) DO UPDATE SET domain=excluded.domain, title=excluded.title, "
+                    "content=excluded.content, fetched_at=excluded.fetched_at, score=excluded.score",
+                    (url, dom, title, content, ts, score),
+                )
+                rowid = conn.execute("SELECT id FROM docs WHERE url = ?", (url,)).fetchone()[0]
+                conn.execute("DELETE FROM docs_fts WHERE rowid = ?", (rowid,))
+                conn.execute("INSERT INTO docs_fts(rowid, title_terms, content_terms) VALUES (?, ?, ?)",
+                             (rowid, title_terms, content_terms))
+    return len(rows)
+
+
+def search_index(query: str, limit: int = 20, max_age: float | None = None) -> list[dict]:
+    """按BM25相关度检索历史文档，max_age（秒）用于限定抓取时间。"""
+    expr = _match_expr(query)
+    if not expr:
+        return []
+    sql = ("SELECT d.url, d.domain, d.title, d.content, d.fetched_at, d.score FROM docs_fts "
+           "JOIN docs d ON d.id = docs_fts.rowid WHERE docs_fts MATCH ?")
+    params: list = [expr]
+    if max_age is not None:
+        sql += " AND d.fetched_at >= ?"
+        params.append(time.time() - max_age)
+    # 标题命中权重高于正文
+    sql += " ORDER BY bm25(docs_fts, 5.0, 1.0) LIMIT ?"
+    params.append(limit)
+    with _lock:
+        rows = _connect().execute(sql, params).fetchall()
+    return [{"url": u, "domain": dom, "title": t, "content": c, "fetched_at": ts, "score": sc}
+            for u, dom, t, c, ts, sc in rows]
@@ -0,0 +1,149 @@
+import os
+import sys
+import threading
+from contextvars import ContextVar
+
+try:
+    import resource
+except ImportError:  # Windows 无 resource 模块，不报告进程峰值
+    resource = None
+
+
+# 单次请求与全进程在途请求的内存预算（MB），0 表示不限制
+REQUEST_MEMORY_MB = float(os.getenv("ZHIYU_REQUEST_MEMORY_MB", "64"))
+GLOBAL_MEMORY_MB = float(os.getenv("ZHIYU_GLOBAL_MEMORY_MB", "512"))
+# 准入估算：每条搜索命中、每篇抓取正文（截断前，含解析中间结果）的字节数
+HIT_BYTES = 1024
+PAGE_BYTES = 256 * 1024
+# 内存不足时降级的下限：抓取篇数或搜索结果低于该值不再有意义，直接拒绝
+MIN_FETCH = 5
+MIN_RESULTS = 20
+
+MB = 1024 * 1024
+
+
+class MemoryBudgetExceeded(Exception):
+    pass
+
+
+class MemoryBudget:
+    """单次请求的内存记账。
+
+    准入时按估算值预留（计入全局在途总量），执行中按实际持有的命中与文档字节数记账；
+    超过 limit 后 charge 返回 False，由调用方停止继续累积（降级为较少的结果）。
+    """
+
+    def __init__(self, limit: int, reserved: int = 0):
+        self.limit = limit
+        self.reserved = reserved
+        self.used = 0
+        self.peak = 0
+        self.exceeded = False
+        self.degraded = []
+        self._lock = threading.Lock()
+
+    def charge(self, nbytes: int) -> bool:
+        with self._lock:
+            self.used += nbytes
+            self.peak = max(self.peak, self.used)
+            if self.limit and self.used > self.limit:
+                self.exceeded = True
+            return not self.exceeded
+
+    def release(self, nbytes: int):
+        with self._lock:
+            self.used = max(self.used - nbytes, 0)
+
+    def summary(self) -> dict:
+        info = {"limit_kb": round(self.limit / 1024, 1), "reserved_kb": round(self.reserved / 1024, 1),
+                "peak_kb": round(self.peak / 1024, 1), "exceeded": self.exceeded, "degraded": self.degraded}
+        rss = process_peak_rss()
+        if rss is not None:
+            info["process_peak_rss_mb"] = round(rss / MB, 1)
+        return info
+
+
+_current: ContextVar[MemoryBudget | None] = ContextVar("zhiyu_memory", default=None)
+_global_lock = threading.Lock()
+_global_reserved = 0
+
+
+def current() -> MemoryBudget | None:
+    return _current.get()
+
+
+def activate(budget: MemoryBudget):
+    return _current.set(budget)
+
+
+def reset(token):
+    _current.reset(token)
+
+
+def charge(nbytes: int) -> bool:
+    """向当前请求记账；无预算上下文（如离线批处理）时总是允许。"""
+    budget = _current.get()
+    return True if budget is None else budget.charge(nbytes)
+
+
+def release(nbytes: int):
+    budget = _current.get()
+    if budget is not None:
+        budget.release(nbytes)
+
+
+def sizeof(*values) -> int:
+    return sum(sys.getsizeof(v) for v in values)
+
+
+def estimate(max_results: int, max_fetch: int) -> int:
+    return max_results * HIT_BYTES + max_fetch * PAGE_BYTES
+
+
+def process_peak_rss() -> int | None:
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 以KB计，macOS 以字节计
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def admit(max_results: int, max_fetch: int) -> tuple[MemoryBudget, int, int]:
+    """按估算值预留内存，返回 (预算, 实际允许的max_results, 实际允许的max_fetch)。
+
+    超出单请求或全局剩余额度时，先降低占估算大头的抓取篇数（不低于MIN_FETCH），
+    仍放不下再降低max_results；降到MIN_RESULTS仍放不下则抛出 MemoryBudgetExceeded。
+    """
+    global _global_reserved
+    request_limit = int(REQUEST_MEMORY_MB * MB)
+    global_limit = int(GLOBAL_MEMORY_MB * MB)
+    with _global_lock:
+        caps = []
+        if request_limit:
+            caps.append(request_limit)
+        if global_limit:
+            caps.append(global_limit - _global_reserved)
+        cap = min(caps) if caps else None
+        granted, fetch = max_results, max_fetch
+        if cap is not None and estimate(granted, fetch) > cap:
+            floor = min(MIN_FETCH, max_fetch)
+            fetch = max(min(fetch, (cap - estimate(granted, 0)) // PAGE_BYTES), floor)
+            if estimate(granted, fetch) > cap:
+                granted = (cap - estimate(0, fetch)) // HIT_BYTES
+                if granted < min(MIN_RESULTS, max_results):
+                    raise MemoryBudgetExceeded("服务器内存繁忙，请稍后重试")
+        reserved = estimate(granted, fetch)
+        _global_reserved += reserved
+    budget = MemoryBudget(request_limit, reserved)
+    if fetch < max_fetch:
+        budget.degraded.append(f"max_fetch:{max_fetch}->{fetch}")
+    if granted < max_results:
+        budget.degraded.append(f"max_results:{max_results}->{granted}")
+    return budget, granted, fetch
+
+
+def finish(budget: MemoryBudget):
+    """请求结束时归还预留额度。"""
+    global _global_reserved
+    with _global_lock:
+        _global_reserved = max(_global_reserved - budget.reserved, 0)
@@ -0,0 +1,131 @@
+import re
+from dataclasses import dataclass, field
+
+
+# 规则名 -> 正则；命中次数超过 DEFAULT_SPAM_LIMITS 中的上限即判定为模板/营销噪声（与 scrape.is_spammy 一致）
+DEFAULT_SPAM_RULES = {
+    "pipes": r"\|{10,}",
+    "stars": r"\*{10,}",
+    "js_link": r"(?i:javascript:void)",
+    "prices": r"\d{2,}\.?\d*万|￥\d+",
+}
+DEFAULT_SPAM_LIMITS = {"pipes": 0, "stars": 0, "js_link": 0, "prices": 10}
+
+_CLEAN_RE = re.compile(r"!\[[^\]]*\]\([^\)]*\)|\[[^\]]*\]\([^\)]*\)|https?://\S+")
+_SPACE_RE = re.compile(r"\s+")
+
+
+def _is_cjk(ch: str) -> bool:
+    return "\u4e00" <= ch <= "\u9fff"
+
+
+def _cjk_class_without(chars) -> str:
+    """构造排除指定字符后的中文字符类，例如 [\u4e00-\u5e7e\u5e80-\u9fff]。"""
+    ranges = []
+    lo = 0x4E00
+    for c in sorted({ord(ch) for ch in chars if _is_cjk(ch)}):
+        if c > lo:
+            ranges.append((lo, c - 1))
+        lo = c + 1
+    if lo <= 0x9FFF:
+        ranges.append((lo, 0x9FFF))
+    return "[" + "".join(chr(a) if a == b else f"{chr(a)}-{chr(b)}" for a, b in ranges) + "]"
+
+
+@dataclass
+class QualityVerdict:
+    text: str
+    length: int
+    cjk_count: int
+    cjk_ratio: float
+    ad_hits: list[str]
+    spam_hits: dict[str, int]
+    is_spam: bool
+    ok: bool
+    reasons: list[str] = field(default_factory=list)
+
+    @property
+    def ad_score(self) -> int:
+        return len(self.ad_hits)
+
+
+class QualityFilter:
+    """一次扫描计算全部质量信号（中文占比、广告词、垃圾模式、长度）。
+
+    所有规则在构造时编译为单个正则：广告词以零宽前瞻匹配，不消耗字符，
+    因此同一位置的中文字符仍会被中文分支计数。中文按连续片段整段匹配，
+    仅在广告词首字处断开，使逐字符的 Python 循环开销降到最低。
+    """
+
+    def __init__(self, ad_keywords=(), spam_rules=None, spam_limits=None,
+                 min_len: int = 0, min_ch_ratio: float = 0.15, max_ad_hits: int = 0):
+        self.ad_keywords = tuple(dict.fromkeys(ad_keywords))
+        self.spam_rules = dict(DEFAULT_SPAM_RULES if spam_rules is None else spam_rules)
+        self.spam_limits = dict(DEFAULT_SPAM_LIMITS if spam_limits is None else spam_limits)
+        self.min_len = min_len
+        self.min_ch_ratio = min_ch_ratio
+        self.max_ad_hits = max_ad_hits
+
+        # 同一起点上长词优先匹配，较短的前缀关键词（如“优惠”之于“优惠券”）一并计入
+        kws = sorted(self.ad_keywords, key=len, reverse=True)
+        self._ad_prefixes = {kw: [k for k in kws if kw.startswith(k)] for kw in kws}
+        self._spam_names = {}
+        branches = []
+        if kws:
+            branches.append("(?=(?P<ad>" + "|".join(re.escape(k) for k in kws) + "))")
+        for i, (name, pat) in enumerate(self.spam_rules.items()):
+            branches.append(f"(?P<s{i}>{pat})")
+            self._spam_names[f"s{i}"] = name
+        branches.append("(?P<cjk>" + _cjk_class_without(k[0] for k in kws) + "+)")
+        branches.append("(?P<cjk1>[\u4e00-\u9fff])")
+        self._scan = re.compile("|".join(branches))
+
+    def clean(self, text: str) -> str:
+        # 移除Markdown图片/链接/裸URL/多余空白
+        if not text:
+            return ""
+        return _SPACE_RE.sub(" ", _CLEAN_RE.sub("", text)).strip()
+
+    def evaluate(self, text: str, clean: bool = True, min_len: int | None = None,
+                 min_ch_ratio: float | None = None) -> QualityVerdict:
+        t = self.clean(text) if clean else (text or "")
+        min_len = self.min_len if min_len is None else min_len
+        min_ch_ratio = self.min_ch_ratio if min_ch_ratio is None else min_ch_ratio
+
+        cjk = 0
+        ads = {}
+        spam = {}
+        names = self._spam_names
+        for m in self._scan.finditer(t):
+            g = m.lastgroup
+            if g == "cjk":
+                cjk += m.end() - m.start()
+            elif g == "cjk1":
+                cjk += 1
+            elif g == "ad":
+                for k in self._ad_prefixes[m.group("ad")]:
+                    ads[k] = True
+            else:
+                name = names[g]
+                spam[name] = spam.get(name, 0) + 1
+                # 垃圾模式会消耗字符，补回其中的中文计数（如“万”）
+                cjk += sum(1 for ch in m.group(g) if _is_cjk(ch))
+
+        length = len(t)
+        ratio = cjk / max(length, 1)
+        is_spam = any(cnt > self.spam_limits.get(name, 0) for name, cnt in spam.items())
+        ad_hits = [k for k in self.ad_keywords if k in ads]
+        reasons = []
+        if not t:
+            reasons.append("empty")
+        if length < min_len:
+            reasons.append("too_short")
+        if ratio < min_ch_ratio:
+            reasons.append("low_chinese_ratio")
+        if len(ad_hits) > self.max_ad_hits:
+            reasons.append("ad_keywords")
+        if is_spam:
+            reasons.append("spam")
+        return QualityVerdict(text=t, length=length, cjk_count=cjk, cjk_ratio=ratio, ad_hits=ad_hits,
+                              spam_hits=spam, is_spam=is_spam, ok=not reasons, reasons=reasons)
+
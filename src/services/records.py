@@ -0,0 +1,74 @@
+import sys
+
+
+class _Record:
+    """紧凑记录类型（__slots__，无实例 __dict__）。
+
+    保留 r["key"] / r.get("key") 的映射式访问，兼容原先以 dict 传递命中与文档的调用方。
+    """
+    __slots__ = ()
+
+    def __getitem__(self, key: str):
+        if key in self.__slots__:
+            return getattr(self, key)
+        raise KeyError(key)
+
+    def __setitem__(self, key: str, value):
+        if key not in self.__slots__:
+            raise KeyError(key)
+        setattr(self, key, value)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.__slots__
+
+    def get(self, key: str, default=None):
+        return getattr(self, key, default) if key in self.__slots__ else default
+
+    def nbytes(self) -> int:
+        """记录本身与各字段对象的浅层字节数，用于请求内存记账。"""
+        return sys.getsizeof(self) + sum(sys.getsizeof(getattr(self, k)) for k in self.__slots__)
+
+    def to_dict(self) -> dict:
+        return {k: getattr(self, k) for k in self.__slots__}
+
+    def __getstate__(self):
+        return tuple(getattr(self, k) for k in self.__slots__)
+
+    def __setstate__(self, state):
+        for k, v in zip(self.__slots__, state):
+            setattr(self, k, v)
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.to_dict()!r})"
+
+
+class SearchHit(_Record):
+    __slots__ = ("title", "href", "body")
+
+    def __init__(self, title: str, href: str, body: str = ""):
+        self.title = title
+        self.href = href
+        self.body = body
+
+
+class Candidate(_Record):
+    """待抓取的候选页面（已规范化URL并去重）。"""
+    __slots__ = ("title", "url", "domain", "snippet")
+
+    def __init__(self, title: str, url: str, domain: str, snippet: str = ""):
+        self.title = title
+        self.url = url
+        self.domain = domain
+        self.snippet = snippet
+
+
+class Document(_Record):
+    """通过过滤的文档；content 已截断至分析预算。"""
+    __slots__ = ("title", "url", "domain", "content", "score")
+
+    def __init__(self, title: str, url: str, domain: str, content: str, score: int = 0):
+        self.title = title
+        self.url = url
+        self.domain = domain
+        self.content = content
+        self.score = score
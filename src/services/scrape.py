@@ -1,8 +1,22 @@
+import os
 import re
+import time
+import heapq
 import asyncio
+import logging
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
 import requests
 from bs4 import BeautifulSoup
 from urllib.parse import urlparse
+from src.services.index import index_documents
+from src.services.analysis import ANALYSIS_CHARS
+from src.services.records import Candidate, Document
+from src.services import memory
+from src.services.quality import QualityFilter
+from src.services.deadline import check as check_budget, request_timeout
+from src.services.frontier import get_frontier
 
 
 AD_KEYWORDS = [
@@ -28,6 +42,37 @@ BLACKLIST_DOMAINS = {
     "baike.baidu.com"
 }
 
+# 单次扫描的质量过滤器，规则与下方 ad_keyword_score / is_spammy 等价
+QUALITY_FILTER = QualityFilter(ad_keywords=AD_KEYWORDS, min_ch_ratio=0.15)
+WHITELIST_MIN_CH_RATIO = 0.1
+
+# 抓取候选上限、并发数与整体时限（秒）；候选按优先级补位，已得到足够优质文档即停止
+MAX_FETCH = int(os.getenv("ZHIYU_MAX_FETCH", "40"))
+FETCH_CONCURRENCY = int(os.getenv("ZHIYU_FETCH_CONCURRENCY", "20"))
+FETCH_DEADLINE_SECONDS = float(os.getenv("ZHIYU_FETCH_DEADLINE_SECONDS", "25"))
+# local：本进程线程池抓取；frontier：经共享队列交给独立抓取工作进程（见 src/services/frontier.py）
+FETCH_BACKEND = os.getenv("ZHIYU_FETCH_BACKEND", "local")
+FRONTIER_POLL_SECONDS = float(os.getenv("ZHIYU_FRONTIER_POLL_SECONDS", "0.25"))
+# 正文抓取使用独立线程池：提前停止时已发出的抓取无法中断，会占用线程直至各自的请求超时，
+# 独立线程池避免其阻塞默认线程池上的索引写入与分析
+FETCH_THREADS = int(os.getenv("ZHIYU_FETCH_THREADS", str(max(FETCH_CONCURRENCY * 2, 32))))
+_fetch_executor = ThreadPoolExecutor(max_workers=FETCH_THREADS, thread_name_prefix="fetch")
+# 索引写入（jieba分词 + SQLite）不在请求关键路径上：单线程后台执行，写入按提交顺序串行
+_index_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="index")
+
+logger = logging.getLogger("zhiyu.scrape")
+
+
+def is_whitelisted(domain: str) -> bool:
+    return any(domain.endswith(d) for d in WHITELIST_DOMAINS)
+
+
+def doc_score(domain: str, content: str) -> int:
+    score = len(content)
+    if is_whitelisted(domain):
+        score += 100  # 白名单来源加权
+    return score
+
 
 def is_chinese_ratio_ok(text: str, min_ratio: float = 0.6):
     if not text:
@@ -88,48 +133,195 @@ def is_spammy(text: str) -> bool:
     return False
 
 
+def html_to_text(html: str) -> str:
+    """从HTML中抽取正文并清洗：优先正文容器，否则取全文。"""
+    if not html:
+        return ""
+    soup = BeautifulSoup(html, 'html5lib')
+    for tag in soup(['script', 'style', 'noscript']):
+        tag.decompose()
+    # 只保留最长的候选正文，避免同时持有多份大文本
+    text = ""
+    for sel in ['article', 'main', 'div#content', 'div.post', 'div.content', 'section']:
+        el = soup.select_one(sel)
+        if el:
+            txt = el.get_text(separator='\n', strip=True)
+            if len(txt) > 300 and len(txt) > len(text):
+                text = txt
+    if not text:
+        text = soup.get_text(separator='\n', strip=True)
+    # 解析树远大于原始HTML，清洗前即释放
+    soup.decompose()
+    del soup
+    return QUALITY_FILTER.clean(text) or ""
+
+
+def fetch_page(u: str, cancelled: threading.Event | None = None) -> str:
+    """同步抓取并清洗正文；网络异常向上抛出，由调用方决定忽略或重试。
+
+    cancelled 被设置（调用方已放弃等待）时不再发起回退请求。
+    """
+    # 先尝试 r.jina.ai 可读接口（免费，无需Key），提升复杂页面抽取质量
+    reader_url = f"https://r.jina.ai/{u}"
+    check_budget()
+    rr = requests.get(reader_url, timeout=request_timeout(8), headers={"User-Agent": "Mozilla/5.0"})
+    # 强制按UTF-8解码，避免乱码
+    rr.encoding = rr.encoding or 'utf-8'
+    text_rr = rr.text
+    if rr.status_code == 200 and text_rr and len(text_rr) > 300:
+        return QUALITY_FILTER.clean(text_rr)
+
+    # 回退为直接抓取HTML并解析
+    check_budget()
+    if cancelled is not None and cancelled.is_set():
+        return ""
+    r = requests.get(u, timeout=request_timeout(8), headers={"User-Agent": "Mozilla/5.0"})
+    if r.status_code != 200:
+        return ""
+    # 使用apparent_encoding或UTF-8，避免中文乱码
+    enc = getattr(r, 'apparent_encoding', None) or 'utf-8'
+    r.encoding = enc
+    return html_to_text(r.text)
+
+
 async def extract_text(url: str) -> str:
+    """在抓取线程池中执行 fetch_page。
+
+    取消时设置该次抓取的取消标记：尚未开始的任务不再执行，进行中的请求运行至其超时
+    （不超过8秒与剩余预算）后不再发起回退请求。
+    """
+    cancelled = threading.Event()
+
     def _worker(u: str) -> str:
+        if cancelled.is_set():
+            return ""
         try:
-            # 先尝试 r.jina.ai 可读接口（免费，无需Key），提升复杂页面抽取质量
-            reader_url = f"https://r.jina.ai/{u}"
-            rr = requests.get(reader_url, timeout=8, headers={"User-Agent": "Mozilla/5.0"})
-            # 强制按UTF-8解码，避免乱码
-            rr.encoding = rr.encoding or 'utf-8'
-            text_rr = rr.text
-            if rr.status_code == 200 and text_rr and len(text_rr) > 300:
-                return clean_text(text_rr)
-
-            # 回退为直接抓取HTML并解析
-            r = requests.get(u, timeout=8, headers={"User-Agent": "Mozilla/5.0"})
-            if r.status_code != 200:
-                return ""
-            # 使用apparent_encoding或UTF-8，避免中文乱码
-            enc = getattr(r, 'apparent_encoding', None) or 'utf-8'
-            r.encoding = enc
-            rtext = r.text
-            if not rtext:
-                return ""
-            soup = BeautifulSoup(rtext, 'html5lib')
-            for tag in soup(['script', 'style', 'noscript']):
-                tag.decompose()
-            candidates = []
-            for sel in ['article', 'main', 'div#content', 'div.post', 'div.content', 'section']:
-                el = soup.select_one(sel)
-                if el:
-                    txt = el.get_text(separator='\n', strip=True)
-                    if txt and len(txt) > 300:
-                        candidates.append(txt)
-            text = max(candidates, key=len) if candidates else soup.get_text(separator='\n', strip=True)
-            return clean_text(text) or ""
+            return fetch_page(u, cancelled)
         except Exception:
             return ""
-    return await asyncio.to_thread(_worker, url)
+    # run_in_executor 不会复制 contextvars，显式携带以便线程内读取请求预算
+    ctx = contextvars.copy_context()
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_fetch_executor, ctx.run, _worker, url)
+    except asyncio.CancelledError:
+        cancelled.set()
+        raise
+
+
+class FrontierFetcher:
+    """将抓取任务交给共享队列中的抓取工作进程（python -m src.fetch_worker），轮询等待正文。
 
+    每次 extract_and_filter_texts 使用一个实例，记录尚未结束的任务；提前停止或超时后由
+    aclose 一次性撤回，避免在事件循环上逐个执行阻塞的SQLite写入。队列读写失败
+    （如 database is locked）与本地抓取失败一样只放弃该URL。
+    """
 
-async def extract_and_filter_texts(results: list[dict], min_len: int = 150, max_docs: int = 20):
-    # 规范化URL去重
-    seen = set()
+    def __init__(self, frontier=None):
+        self.frontier = frontier or get_frontier()
+        self.pending = set()
+        self._closed = False
+        self._lock = threading.Lock()
+
+    def _submit(self, url: str) -> int | None:
+        # 在提交线程内登记任务：等待方被取消时 submit 仍会完成，任务id不能因此丢失
+        ids = self.frontier.submit([url])
+        with self._lock:
+            closed = self._closed
+            if not closed:
+                self.pending.update(ids)
+        if closed:
+            # aclose 已执行：直接撤回，避免工作进程抓取无人等待的页面
+            self.frontier.cancel(ids)
+            return None
+        return ids[0]
+
+    async def __call__(self, url: str) -> str:
+        try:
+            task_id = await asyncio.to_thread(self._submit, url)
+            if task_id is None:
+                return ""
+            while True:
+                task = (await asyncio.to_thread(self.frontier.get, [task_id])).get(task_id) or {}
+                if task.get("status") in ("done", "failed", "cancelled"):
+                    with self._lock:
+                        self.pending.discard(task_id)
+                    return (task.get("text") or "") if task.get("status") == "done" else ""
+                await asyncio.sleep(FRONTIER_POLL_SECONDS)
+        except Exception as e:
+            logger.warning("frontier fetch failed for %s: %s", url, e)
+            return ""
+
+    async def aclose(self):
+        """撤回尚未完成的任务，释放工作进程。"""
+        with self._lock:
+            self._closed = True
+            ids, self.pending = list(self.pending), set()
+        if ids:
+            try:
+                await asyncio.to_thread(self.frontier.cancel, ids)
+            except Exception as e:
+                logger.warning("frontier cancel failed for %d tasks: %s", len(ids), e)
+
+
+def _index_in_background(docs: list):
+    try:
+        index_documents(docs)
+    except Exception:
+        logger.exception("index write failed for %d docs", len(docs))
+
+
+def default_fetcher():
+    return FrontierFetcher() if FETCH_BACKEND == "frontier" else extract_text
+
+
+def filter_document(it: Candidate | dict, content: str, stats: dict, quality: QualityFilter, min_len: int) -> Document | None:
+    """对单篇抓取结果执行回退、过滤与评分；未通过时返回None并记录统计。
+
+    评分按完整正文计算，返回的文档正文截断至 ANALYSIS_CHARS。
+    """
+    if not content:
+        # 回退使用snippet
+        content = (it.get("snippet") or "").strip()
+        if not content:
+            stats["filtered"]["empty"] += 1
+            return None
+    content = content.strip()
+    # 如果过短，尝试拼接snippet增强
+    if len(content) < min_len and it.get("snippet"):
+        content = (content + "\n" + it["snippet"]).strip()
+    # 更宽松：域名白名单进一步降低中文比例要求
+    min_ratio = WHITELIST_MIN_CH_RATIO if is_whitelisted(it['domain']) else quality.min_ch_ratio
+    verdict = quality.evaluate(content, clean=False, min_len=min_len, min_ch_ratio=min_ratio)
+    # 允许较短文本进入，但记录统计；仅在中文比例极低时过滤
+    if "too_short" in verdict.reasons:
+        stats["filtered"]["too_short"] += 1
+    if "low_chinese_ratio" in verdict.reasons:
+        stats["filtered"]["low_chinese_ratio"] += 1
+        if verdict.length < 120:
+            return None
+    if "ad_keywords" in verdict.reasons or verdict.is_spam:
+        stats["filtered"]["ad_keywords"] += 1
+        return None
+    return Document(it["title"], it["url"], it.get("domain", ""), content[:ANALYSIS_CHARS], doc_score(it["domain"], content))
+
+
+async def extract_and_filter_texts(results: list, min_len: int = 150, max_docs: int = 20, skip_urls: set | None = None,
+                                   quality: QualityFilter | None = None, good_score: int | None = None,
+                                   deadline: float | None = None, max_fetch: int = MAX_FETCH, concurrency: int = FETCH_CONCURRENCY,
+                                   fetcher=None):
+    """按优先级抓取并逐篇过滤，维护得分前max_docs的文档。
+
+    已有max_docs篇得分不低于good_score（默认min_len）的文档，或到达deadline
+    （time.monotonic()时刻，默认FETCH_DEADLINE_SECONDS后）时提前结束并取消未完成的抓取；
+    持有的正文超过当前请求的内存预算时同样提前结束（stop_reason为memory）。
+    """
+    quality = quality or QUALITY_FILTER
+    fetcher = fetcher or default_fetcher()
+    good_score = min_len if good_score is None else good_score
+    if deadline is None:
+        deadline = time.monotonic() + FETCH_DEADLINE_SECONDS
+    # 规范化URL去重（skip_urls为已从本地索引取得的文档，无需重复抓取）
+    seen = set(skip_urls or ())
     uniq = []
     for r in results:
         u = normalize_url(r.get("href") or r.get("url") or "")
@@ -142,19 +334,14 @@ async def extract_and_filter_texts(results: list[dict], min_len: int = 150, max_
         if any(bad in dom for bad in BLACKLIST_DOMAINS):
             continue
         snippet = r.get("body") or ""
-        uniq.append({"title": title, "url": u, "domain": dom, "snippet": snippet})
+        uniq.append(Candidate(title, u, dom, snippet))
 
-    # 白名单优先排序
-    uniq.sort(key=lambda it: (0 if any(it['domain'].endswith(d) for d in WHITELIST_DOMAINS) else 1, it['domain']))
+    # 白名单优先排序，按此顺序发起抓取
+    uniq.sort(key=lambda it: (0 if is_whitelisted(it['domain']) else 1, it['domain']))
+    queue = uniq[:max_fetch]
 
-    # 并发抽取
-    tasks = [extract_text(it["url"]) for it in uniq[:20]]
-    contents = await asyncio.gather(*tasks)
-
-    # 过滤与评分
-    docs = []
     stats = {
-        "attempted": len(contents),
+        "attempted": 0,
         "kept": 0,
         "filtered": {
             "empty": 0,
@@ -162,38 +349,65 @@ async def extract_and_filter_texts(results: list[dict], min_len: int = 150, max_
             "low_chinese_ratio": 0,
             "ad_keywords": 0
         },
-        "thresholds": {"min_len": min_len, "min_ch_ratio": 0.5}
+        "thresholds": {"min_len": min_len, "min_ch_ratio": quality.min_ch_ratio, "good_score": good_score},
+        "cancelled": 0,
+        "stop_reason": "exhausted"
     }
-    for it, content in zip(uniq, contents):
-        if not content:
-            # 回退使用snippet
-            content = (it.get("snippet") or "").strip()
-            if not content:
-                stats["filtered"]["empty"] += 1
-                continue
-        content = content.strip()
-        # 如果过短，尝试拼接snippet增强
-        if len(content) < min_len and it.get("snippet"):
-            content = (content + "\n" + it["snippet"]).strip()
-        # 允许较短文本进入，但记录统计；仅在中文比例极低时过滤
-        if len(content) < min_len:
-            stats["filtered"]["too_short"] += 1
-        # 更宽松：域名白名单进一步降低中文比例要求
-        min_ratio = 0.1 if any(it['domain'].endswith(d) for d in WHITELIST_DOMAINS) else 0.15
-        if not is_chinese_ratio_ok(content, min_ratio):
-            stats["filtered"]["low_chinese_ratio"] += 1
-            if len(content) < 120:
-                continue
-        if ad_keyword_score(content) >= 1 or is_spammy(content):
-            stats["filtered"]["ad_keywords"] += 1
-            continue
-        score = len(content)
-        if any(it['domain'].endswith(d) for d in WHITELIST_DOMAINS):
-            score += 100  # 白名单来源加权
-        docs.append({"title": it["title"], "url": it["url"], "domain": it.get("domain", ""), "content": content, "score": score})
-
-    # 选取前max_docs
-    docs.sort(key=lambda d: d["score"], reverse=True)
-    kept_docs = docs[:max_docs]
+    passed = []  # 所有通过过滤的文档，用于写入索引
+    top = []     # (score, -priority, doc) 小顶堆，保留得分前max_docs
+    good = 0
+    pending = {}
+    pos = 0
+    try:
+        while pos < len(queue) or pending:
+            while pos < len(queue) and len(pending) < concurrency:
+                task = asyncio.ensure_future(fetcher(queue[pos]["url"]))
+                pending[task] = pos
+                pos += 1
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                stats["stop_reason"] = "deadline"
+                break
+            done, _ = await asyncio.wait(pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+            within_budget = True
+            for task in done:
+                idx = pending.pop(task)
+                stats["attempted"] += 1
+                raw = task.result()
+                # 原始正文在过滤期间计入请求内存，过滤后只保留截断的文档
+                memory.charge(memory.sizeof(raw))
+                doc = filter_document(queue[idx], raw, stats, quality, min_len)
+                memory.release(memory.sizeof(raw))
+                if doc is None:
+                    continue
+                within_budget = memory.charge(doc.nbytes()) and within_budget
+                passed.append(doc)
+                if doc["score"] >= good_score:
+                    good += 1
+                item = (doc["score"], -idx, doc)
+                if len(top) < max_docs:
+                    heapq.heappush(top, item)
+                elif item[:2] > top[0][:2]:
+                    heapq.heapreplace(top, item)
+            if good >= max_docs:
+                stats["stop_reason"] = "enough_docs"
+                break
+            if not within_budget:
+                stats["stop_reason"] = "memory"
+                break
+    finally:
+        for task in pending:
+            task.cancel()
+        stats["cancelled"] = len(pending) + max(len(queue) - pos, 0)
+        aclose = getattr(fetcher, "aclose", None)
+        if aclose is not None:
+            await aclose()
+
+    # 持久化到本地全文索引：后台写入，不等待完成，失败只记日志
+    if passed:
+        _index_executor.submit(_index_in_background, passed)
+    stats["index_queued"] = len(passed)
+
+    kept_docs = [doc for _, _, doc in sorted(top, key=lambda x: x[:2], reverse=True)]
     stats["kept"] = len(kept_docs)
-    return kept_docs, stats
\ No newline at end of file
+    return kept_docs, stats
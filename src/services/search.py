@@ -1,14 +1,93 @@
 import os
+import time
 import asyncio
+import contextvars
 import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
 import requests
 from bs4 import BeautifulSoup
 import feedparser
+from src.services import deadline, memory
+from src.services.records import SearchHit
 
 
-async def search_web(query: str, max_results: int = 12):
-    """聚合多源搜索，尽量返回至少max_results条结果。"""
-    meta = {"attempted_sources": [], "chosen_source": None, "errors": []}
+# 分页：每页约PAGE_SIZE条，每个来源最多抓取PAGE_BUDGET页
+PAGE_SIZE = 10
+PAGE_BUDGET = int(os.getenv("ZHIYU_SEARCH_PAGE_BUDGET", "5"))
+# 搜索请求为阻塞IO，使用独立线程池，避免与正文抓取争用默认线程池
+_executor = ThreadPoolExecutor(max_workers=int(os.getenv("ZHIYU_SEARCH_THREADS", "48")), thread_name_prefix="search")
+
+
+def _checked(fn, *args):
+    deadline.check()
+    return fn(*args)
+
+
+def _in_thread(fn, *args):
+    # run_in_executor 不会复制 contextvars，这里显式携带以便线程内读取请求预算
+    ctx = contextvars.copy_context()
+    return asyncio.get_running_loop().run_in_executor(_executor, ctx.run, _checked, fn, *args)
+
+
+def _left(stage_deadline: float | None) -> float | None:
+    return None if stage_deadline is None else max(stage_deadline - time.monotonic(), 0)
+
+
+async def _paginate(fetch, *args, max_results: int, budget: int = PAGE_BUDGET, stage_deadline: float | None = None):
+    """并发抓取多页结果：首轮同时请求所需页数，某页无新URL时停止继续翻页。
+
+    首页失败时抛出异常（记入errors），后续页失败视为无更多结果；
+    到达stage_deadline时放弃未返回的页，保留已得到的结果。
+    """
+    results = []
+    seen = set()
+    page = 0
+    while page < budget and len(results) < max_results:
+        need = -(-(max_results - len(results)) // PAGE_SIZE)
+        wave = list(range(page, min(page + need, budget)))
+        futs = [_in_thread(fetch, *args, max_results, p) for p in wave]
+        try:
+            done, pending = await asyncio.wait(futs, timeout=_left(stage_deadline))
+        finally:
+            # 取消未返回的页，并读取已失败页的异常：提前break或本协程被取消时，
+            # 未读取的异常会在回收时打印 "Future exception was never retrieved"
+            for fut in futs:
+                if not fut.done():
+                    fut.cancel()
+                elif not fut.cancelled():
+                    fut.exception()
+        exhausted = bool(pending)
+        for p, fut in zip(wave, futs):
+            if fut not in done:
+                break
+            if fut.exception() is not None:
+                if p == 0:
+                    raise fut.exception()
+                exhausted = True
+                break
+            fresh = 0
+            for it in fut.result():
+                href = it.get("url")
+                if href and href not in seen:
+                    seen.add(href)
+                    results.append(it)
+                    fresh += 1
+            if fresh == 0:
+                exhausted = True
+                break
+        if exhausted:
+            break
+        page = wave[-1] + 1
+    return results[:max_results]
+
+
+async def search_web(query: str, max_results: int = 12, stage_deadline: float | None = None):
+    """聚合多源搜索，尽量返回至少max_results条结果。各来源并发请求，结果按固定顺序合并。
+
+    stage_deadline（time.monotonic()时刻）到达时放弃未完成的来源，记入meta["timed_out"]；
+    命中累计超过当前请求的内存预算时不再合并后续结果（meta["memory_truncated"]）。
+    """
+    meta = {"attempted_sources": [], "chosen_source": None, "errors": [], "timed_out": [], "memory_truncated": False}
     pool = []
     seen = set()
     qmod = f"{query} -推广 -广告 -下载 -APP -优惠券 -试驾 -促销 -降价"
@@ -18,53 +97,53 @@ async def search_web(query: str, max_results: int = 12):
         if items and meta["chosen_source"] is None:
             meta["chosen_source"] = source
         for it in items or []:
+            if meta["memory_truncated"] or len(pool) >= max_results:
+                return
             href = it.get("url") or it.get("href")
             if not href or href in seen:
                 continue
             seen.add(href)
-            pool.append({"title": it.get("title") or it.get("source") or "(无标题)",
-                        "href": href,
-                        "body": it.get("snippet", "")})
+            hit = SearchHit(it.get("title") or it.get("source") or "(无标题)", href, it.get("snippet") or "")
+            pool.append(hit)
+            if not memory.charge(hit.nbytes()):
+                meta["memory_truncated"] = True
 
-    # News源
-    try:
-        _add(_baidu_news_query(qmod, max_results*2), "baidu_news")
-    except Exception as e:
-        meta["errors"].append(f"baidu_news:{e}")
-    try:
-        _add(_sogou_news_query(qmod, max_results*2), "sogou_news")
-    except Exception as e:
-        meta["errors"].append(f"sogou_news:{e}")
-
-    # SearxNG多候选
+    # (来源, 错误前缀, 协程)；顺序即合并优先级
     searx_url = os.getenv("SEARXNG_URL")
     candidates = [searx_url] if searx_url else []
     candidates += ["https://searx.tiekoetter.com", "https://search.bus-hit.me", "https://searx.be"]
+    paged = {"stage_deadline": stage_deadline}
+    jobs = [
+        # News源
+        ("baidu_news", "baidu_news", _in_thread(_baidu_news_query, qmod, max_results*2)),
+        ("sogou_news", "sogou_news", _paginate(_sogou_news_query, qmod, max_results=max_results*2, **paged)),
+    ]
+    # SearxNG多候选
     for cand in candidates:
-        try:
-            _add(_searxng_query(cand, qmod, max_results), f"searxng:{cand}")
-        except Exception as e:
-            meta["errors"].append(f"searxng:{e}")
-
-    # 通用网页
-    try:
-        _add(_baidu_html_query(qmod, max_results), "baidu_html")
-    except Exception as e:
-        meta["errors"].append(f"baidu:{e}")
-    try:
-        _add(_bing_html_query(qmod, max_results), "bing_html")
-    except Exception as e:
-        meta["errors"].append(f"bing:{e}")
-
-    # 社交公开页
-    try:
-        _add(_bing_site_query(qmod, "weibo.com", max_results), "bing_site_weibo")
-    except Exception as e:
-        meta["errors"].append(f"bing_site_weibo:{e}")
+        jobs.append((f"searxng:{cand}", "searxng", _in_thread(_searxng_query, cand, qmod, max_results)))
+    jobs += [
+        # 通用网页
+        ("baidu_html", "baidu", _paginate(_baidu_html_query, qmod, max_results=max_results, **paged)),
+        ("bing_html", "bing", _paginate(_bing_html_query, qmod, max_results=max_results, **paged)),
+        # 社交公开页
+        ("bing_site_weibo", "bing_site_weibo", _paginate(_bing_site_query, qmod, "weibo.com", max_results=max_results, **paged)),
+        ("bing_site_weixin", "bing_site_weixin", _paginate(_bing_site_query, qmod, "mp.weixin.qq.com", max_results=max_results, **paged)),
+    ]
+    tasks = [asyncio.ensure_future(job) for _, _, job in jobs]
     try:
-        _add(_bing_site_query(qmod, "mp.weixin.qq.com", max_results), "bing_site_weixin")
-    except Exception as e:
-        meta["errors"].append(f"bing_site_weixin:{e}")
+        done, pending = await asyncio.wait(tasks, timeout=_left(stage_deadline))
+    finally:
+        # 超时或请求被取消时，放弃仍未完成的来源
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+    for (source, label, _), task in zip(jobs, tasks):
+        if task not in done:
+            meta["timed_out"].append(source)
+        elif task.exception() is not None:
+            meta["errors"].append(f"{label}:{task.exception()}")
+        else:
+            _add(task.result(), source)
 
     formatted = pool[:max_results]
     meta["items_count"] = len(formatted)
@@ -80,7 +159,7 @@ def _searxng_query(base_url: str, query: str, max_results: int):
         'safesearch': 1,
         'categories': 'general'
     }
-    r = requests.get(url, params=params, timeout=12, headers={"User-Agent": "Mozilla/5.0", "Accept-Language": "zh-CN,zh;q=0.9"})
+    r = requests.get(url, params=params, timeout=deadline.request_timeout(12), headers={"User-Agent": "Mozilla/5.0", "Accept-Language": "zh-CN,zh;q=0.9"})
     r.raise_for_status()
     data = r.json()
     results = []
@@ -89,10 +168,10 @@ def _searxng_query(base_url: str, query: str, max_results: int):
     return results
 
 
-def _bing_html_query(query: str, max_results: int):
+def _bing_html_query(query: str, max_results: int, page: int = 0):
     q = urllib.parse.quote(query)
-    url = f"https://www.bing.com/search?q={q}&ensearch=1&setlang=zh-cn"
-    r = requests.get(url, timeout=12, headers={"User-Agent": "Mozilla/5.0", "Accept-Language": "zh-CN,zh;q=0.9"})
+    url = f"https://www.bing.com/search?q={q}&ensearch=1&setlang=zh-cn&first={page * PAGE_SIZE + 1}"
+    r = requests.get(url, timeout=deadline.request_timeout(12), headers={"User-Agent": "Mozilla/5.0", "Accept-Language": "zh-CN,zh;q=0.9"})
     r.raise_for_status()
     soup = BeautifulSoup(r.text, 'html5lib')
     results = []
@@ -107,14 +186,15 @@ def _bing_html_query(query: str, max_results: int):
         results.append({"title": title, "url": href, "snippet": snippet})
         if len(results) >= max_results:
             break
+    soup.decompose()
     return results
 
 
-def _bing_site_query(query: str, site: str, max_results: int):
+def _bing_site_query(query: str, site: str, max_results: int, page: int = 0):
     # 使用Bing的site过滤，抓取社交平台公开页
     q = urllib.parse.quote(f"site:{site} {query}")
-    url = f"https://www.bing.com/search?q={q}&ensearch=1&setlang=zh-cn"
-    r = requests.get(url, timeout=12, headers={"User-Agent": "Mozilla/5.0", "Accept-Language": "zh-CN,zh;q=0.9"})
+    url = f"https://www.bing.com/search?q={q}&ensearch=1&setlang=zh-cn&first={page * PAGE_SIZE + 1}"
+    r = requests.get(url, timeout=deadline.request_timeout(12), headers={"User-Agent": "Mozilla/5.0", "Accept-Language": "zh-CN,zh;q=0.9"})
     r.raise_for_status()
     soup = BeautifulSoup(r.text, 'html5lib')
     results = []
@@ -129,13 +209,14 @@ def _bing_site_query(query: str, site: str, max_results: int):
         results.append({"title": title, "url": href, "snippet": snippet})
         if len(results) >= max_results:
             break
+    soup.decompose()
     return results
 
 
-def _baidu_html_query(query: str, max_results: int):
+def _baidu_html_query(query: str, max_results: int, page: int = 0):
     q = urllib.parse.quote(query)
-    url = f"https://www.baidu.com/s?wd={q}"
-    r = requests.get(url, timeout=12, headers={"User-Agent": "Mozilla/5.0", "Accept-Language": "zh-CN,zh;q=0.9"})
+    url = f"https://www.baidu.com/s?wd={q}&pn={page * PAGE_SIZE}"
+    r = requests.get(url, timeout=deadline.request_timeout(12), headers={"User-Agent": "Mozilla/5.0", "Accept-Language": "zh-CN,zh;q=0.9"})
     r.raise_for_status()
     soup = BeautifulSoup(r.text, 'lxml')
     results = []
@@ -150,6 +231,7 @@ def _baidu_html_query(query: str, max_results: int):
         results.append({"title": title, "url": href, "snippet": snippet})
         if len(results) >= max_results:
             break
+    soup.decompose()
     return results
 
 
@@ -166,7 +248,7 @@ def _google_news_rss(query: str, max_results: int):
 def _baidu_news_query(query: str, max_results: int):
     q = urllib.parse.quote(query)
     url = f"https://news.baidu.com/ns?word={q}&tn=news&from=news&cl=2&rn={max_results}&ct=1"
-    r = requests.get(url, timeout=12, headers={"User-Agent": "Mozilla/5.0", "Accept-Language": "zh-CN,zh;q=0.9"})
+    r = requests.get(url, timeout=deadline.request_timeout(12), headers={"User-Agent": "Mozilla/5.0", "Accept-Language": "zh-CN,zh;q=0.9"})
     r.raise_for_status()
     soup = BeautifulSoup(r.text, 'html5lib')
     results = []
@@ -192,13 +274,14 @@ def _baidu_news_query(query: str, max_results: int):
                 results.append({"title": title, "url": href, "snippet": ''})
             if len(results) >= max_results:
                 break
+    soup.decompose()
     return results
 
 
-def _sogou_news_query(query: str, max_results: int):
+def _sogou_news_query(query: str, max_results: int, page: int = 0):
     q = urllib.parse.quote(query)
-    url = f"https://news.sogou.com/news?query={q}&type=2&page=1&num={max_results}"
-    r = requests.get(url, timeout=12, headers={"User-Agent": "Mozilla/5.0", "Accept-Language": "zh-CN,zh;q=0.9"})
+    url = f"https://news.sogou.com/news?query={q}&type=2&page={page + 1}&num={PAGE_SIZE}"
+    r = requests.get(url, timeout=deadline.request_timeout(12), headers={"User-Agent": "Mozilla/5.0", "Accept-Language": "zh-CN,zh;q=0.9"})
     r.raise_for_status()
     soup = BeautifulSoup(r.text, 'html5lib')
     results = []
@@ -219,6 +302,7 @@ def _sogou_news_query(query: str, max_results: int):
                 results.append({"title": title, "url": href, "snippet": ''})
             if len(results) >= max_results:
                 break
+    soup.decompose()
     return results
 
 
@@ -230,7 +314,7 @@ def _wikipedia_api_query(query: str, max_results: int):
         "srsearch": query,
         "format": "json"
     }
-    r = requests.get(api, params=params, timeout=12, headers={"User-Agent": "Mozilla/5.0"})
+    r = requests.get(api, params=params, timeout=deadline.request_timeout(12), headers={"User-Agent": "Mozilla/5.0"})
     r.raise_for_status()
     data = r.json()
     results = []